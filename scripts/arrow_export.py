@@ -0,0 +1,191 @@
+import os
+import base64
+
+import shapely
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import plotly.graph_objects as go
+
+from geometry_validation import polygon_parts
+
+
+def to_arrow_table(gdf, geometry_encoding="geoarrow"):
+    """
+    Converts a GeoDataFrame to a pyarrow Table.
+
+    GeoArrow only represents a single geometry family per column (e.g. Polygon with
+    MultiPolygon); mixed layers such as Points and Polygons fall back to WKB.
+
+    Parameters:
+        gdf (GeoDataFrame): Input GeoDataFrame.
+        geometry_encoding (str): "geoarrow" for native GeoArrow coordinate arrays, or "WKB".
+
+    Returns:
+        pyarrow.Table: Attributes and geometry, with GeoArrow extension metadata.
+    """
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+    if geometry_encoding == "geoarrow":
+        try:
+            return pa.table(gdf.to_arrow(index=False, geometry_encoding="geoarrow"))
+        except ValueError as e:
+            print(f"GeoArrow encoding not possible ({e}); using WKB")
+            geometry_encoding = "WKB"
+    return pa.table(gdf.to_arrow(index=False, geometry_encoding=geometry_encoding))
+
+
+def arrow_ipc_bytes(gdf, compression="zstd", geometry_encoding="geoarrow"):
+    """
+    Serializes a GeoDataFrame to an Arrow IPC (Feather v2) file in memory.
+
+    Parameters:
+        gdf (GeoDataFrame): Input GeoDataFrame.
+        compression (str): "zstd", "lz4" or None for uncompressed buffers.
+        geometry_encoding (str): "geoarrow" or "WKB".
+
+    Returns:
+        bytes: The IPC file contents.
+    """
+    table = to_arrow_table(gdf, geometry_encoding)
+    sink = pa.BufferOutputStream()
+    with ipc.new_file(sink, table.schema, options=ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_ipc_base64(gdf, compression="zstd", geometry_encoding="geoarrow"):
+    """
+    Returns the Arrow IPC payload as a base64 string, ready to embed in an HTML page.
+    """
+    return base64.b64encode(arrow_ipc_bytes(gdf, compression, geometry_encoding)).decode("ascii")
+
+
+def write_arrow_sidecar(gdf, html_file, name="data", compression="zstd", geometry_encoding="geoarrow"):
+    """
+    Writes the layer as an Arrow IPC file next to an HTML map, e.g. `map.html` -> `map.data.arrow`,
+    so the page can fetch binary data instead of parsing GeoJSON text.
+
+    Returns:
+        str: Path of the sidecar file.
+    """
+    sidecar = f"{os.path.splitext(html_file)[0]}.{name}.arrow"
+    with open(sidecar, "wb") as f:
+        f.write(arrow_ipc_bytes(gdf, compression, geometry_encoding))
+    print(f"Arrow sidecar saved: {sidecar}")
+    return sidecar
+
+
+def add_arrow_data(kepler_map, gdf, name="data"):
+    """
+    Adds a GeoDataFrame to a KeplerGl map as an Arrow payload instead of GeoJSON/CSV text.
+    """
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+    kepler_map.add_data(data=gdf, name=name, use_arrow=True)
+
+
+def ring_arrays(gdf, rings="exterior"):
+    """
+    Flattens the rings of a polygonal layer (or the parts of a line layer) into lon/lat arrays
+    separated by NaN, the layout Plotly uses to draw many shapes in a single trace.
+
+    Plotly fills every NaN-separated segment as its own polygon, so holes cannot be cut out of
+    a filled trace: use rings="exterior" for the filled trace and rings="interior" for a
+    line-only trace outlining the holes.
+
+    Parameters:
+        gdf (GeoDataFrame): Input GeoDataFrame.
+        rings (str): "exterior", "interior" or "all" (ignored for line layers).
+
+    Returns:
+        tuple: (lon, lat, feature) NumPy arrays, where feature is the row position of each vertex
+        (-1 on the NaN separators).
+    """
+    geometry = gdf.geometry
+    if geometry.crs is not None and not geometry.crs.equals("EPSG:4326"):
+        geometry = geometry.to_crs("EPSG:4326")
+    geoms = geometry.to_numpy()
+
+    parts, feature = polygon_parts(geoms)
+    if len(parts):
+        all_rings, part_index = shapely.get_rings(parts, return_index=True)
+        exterior = np.r_[True, part_index[1:] != part_index[:-1]]
+        selected = {"exterior": exterior, "interior": ~exterior, "all": np.ones_like(exterior)}[rings]
+        lines, feature = all_rings[selected], feature[part_index[selected]]
+    else:
+        lines, feature = shapely.get_parts(geoms, return_index=True)
+        if not np.isin(shapely.get_type_id(lines), (1, 2)).all():
+            raise ValueError("ring_arrays needs line or polygon geometries")
+
+    coords = shapely.get_coordinates(lines)
+    counts = shapely.get_num_coordinates(lines)
+    breaks = np.cumsum(counts)[:-1]
+    lon = np.insert(coords[:, 0], breaks, np.nan)
+    lat = np.insert(coords[:, 1], breaks, np.nan)
+    feature = np.insert(np.repeat(feature, counts), breaks, -1)
+    return lon, lat, feature
+
+
+def _hover_text(gdf, name_column, feature):
+    """Per-vertex hover labels from `name_column` (None if the column is missing)."""
+    if name_column not in gdf.columns:
+        return None
+    labels = np.append(gdf[name_column].astype(str).to_numpy(), "")
+    return labels[feature]
+
+
+def plotly_polygon_trace(gdf, name_column="Name", name="Polygons", fill=True, **trace_kwargs):
+    """
+    Builds a single Scattermapbox trace for all the polygons of a GeoDataFrame from NumPy arrays.
+
+    Only exterior rings are drawn (Plotly would fill holes instead of cutting them out);
+    add plotly_hole_trace to outline the holes.
+
+    Parameters:
+        gdf (GeoDataFrame): Input GeoDataFrame with Polygon/MultiPolygon geometries.
+        name_column (str): Column shown on hover (if present).
+        name (str): Trace name.
+        fill (bool): Whether to fill the polygons ("toself").
+        **trace_kwargs: Extra arguments for go.Scattermapbox (line, fillcolor...).
+
+    Returns:
+        plotly.graph_objects.Scattermapbox
+    """
+    lon, lat, feature = ring_arrays(gdf, rings="exterior")
+    text = _hover_text(gdf, name_column, feature)
+
+    return go.Scattermapbox(
+        lon=lon,
+        lat=lat,
+        mode="lines",
+        fill="toself" if fill else "none",
+        text=text,
+        hoverinfo="text" if text is not None else "lon+lat",
+        name=name,
+        **trace_kwargs
+    )
+
+
+def plotly_hole_trace(gdf, name_column="Name", name="Holes", **trace_kwargs):
+    """
+    Builds a line-only Scattermapbox trace with the interior rings (holes) of a polygon layer.
+
+    Returns:
+        plotly.graph_objects.Scattermapbox, or None if the layer has no holes.
+    """
+    lon, lat, feature = ring_arrays(gdf, rings="interior")
+    if len(lon) == 0:
+        return None
+    text = _hover_text(gdf, name_column, feature)
+
+    return go.Scattermapbox(
+        lon=lon,
+        lat=lat,
+        mode="lines",
+        fill="none",
+        text=text,
+        hoverinfo="text" if text is not None else "lon+lat",
+        name=name,
+        **trace_kwargs
+    )
@@ -1,4 +1,6 @@
 import math
+import shapely
+import numpy as np
 import geopandas as gpd
 
 from bokeh.io import output_file
@@ -6,6 +8,9 @@ from bokeh.plotting import figure, show
 from bokeh.models import ColumnDataSource
 from bokeh.tile_providers import get_provider, Vendors
 
+from geometry_store import GeometryStore
+from geometry_validation import polygon_parts
+
 def latlon_to_web_mercator(lat, lon):
     """
     Convert latitude and longitude to Web Mercator projection.
@@ -15,29 +20,33 @@ def latlon_to_web_mercator(lat, lon):
     y = math.log(math.tan((90 + lat) * math.pi / 360.0)) * k
     return x, y
 
-# Extract x and y coordinates for polygons, ignoring z-coordinate
-def extract_coords(geometry):
-    if geometry.geom_type == "Polygon":
-        # Extract x, y from 3D coordinates
-        coords = [(coord[0], coord[1]) for coord in geometry.exterior.coords]
-    elif geometry.geom_type == "MultiPolygon":
-        # Handle MultiPolygons by extracting all exterior rings
-        coords = [(coord[0], coord[1]) for polygon in geometry for coord in polygon.exterior.coords]
-    else:
-        coords = []  # Handle unsupported geometries gracefully
-    return coords
-
 # Load GeoPandas DataFrame
 gdf = gpd.read_file("Centros Comerciales.kml")
 gdf.head()
 
-# Extract coordinates and convert to Web Mercator
-gdf["xs"] = gdf.geometry.apply(
-    lambda geom: [latlon_to_web_mercator(lat, lon)[0] for lon, lat in extract_coords(geom)]
-)
-gdf["ys"] = gdf.geometry.apply(
-    lambda geom: [latlon_to_web_mercator(lat, lon)[1] for lon, lat in extract_coords(geom)]
-)
+# Convert the exterior ring of every polygon part to Web Mercator in one vectorized call
+# (Z is dropped by the store). Holes are left out, and the parts of a MultiPolygon are
+# separated by NaN, which Bokeh patches draws as disconnected pieces of the same patch.
+parts, feature = polygon_parts(gdf.geometry.to_numpy())
+exteriors = shapely.polygons(shapely.get_exterior_ring(parts))
+store = GeometryStore.from_shapely(exteriors, crs=gdf.crs).to_crs("EPSG:3857")
+
+# One ring per part, and parts are sorted by feature: put a NaN between consecutive rings of
+# the same feature, then cut the flat arrays where the feature changes.
+ring_starts = store.offsets[0][1:-1]
+same_feature = feature[1:] == feature[:-1]
+separators = ring_starts[same_feature]
+cuts = ring_starts[~same_feature]
+cuts = cuts + np.searchsorted(separators, cuts)
+
+xs = np.split(np.insert(store.coords[:, 0], separators, np.nan), cuts)
+ys = np.split(np.insert(store.coords[:, 1], separators, np.nan), cuts)
+# Features without polygon parts (points, collapsed geometries) get empty arrays.
+xs_by_row, ys_by_row = [np.empty(0)] * len(gdf), [np.empty(0)] * len(gdf)
+for row, x, y in zip(np.unique(feature), xs, ys):
+    xs_by_row[row], ys_by_row[row] = x, y
+gdf["xs"] = xs_by_row
+gdf["ys"] = ys_by_row
 
 # Create a Bokeh ColumnDataSource
 source = ColumnDataSource({
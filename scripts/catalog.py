@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+GEO_EXTENSIONS = ('.kml', '.kmz', '.geojson', '.json', '.parquet', '.shp', '.gpkg')
+# Errors that come from the Python environment rather than from the file (a missing driver,
+# running out of memory...): they abort the crawl instead of being stored as a failure.
+ENVIRONMENT_ERRORS = (ImportError, MemoryError)
+
+GEOJSON_TYPES = {
+    "FeatureCollection", "Feature", "Point", "MultiPoint", "LineString", "MultiLineString",
+    "Polygon", "MultiPolygon", "GeometryCollection",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    checksum TEXT,
+    crs TEXT,
+    feature_count INTEGER,
+    indexed_at REAL,
+    status TEXT NOT NULL DEFAULT 'indexed',
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS features (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS features_file_id ON features(file_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS file_extents USING rtree(id, minx, maxx, miny, maxy);
+CREATE VIRTUAL TABLE IF NOT EXISTS feature_extents USING rtree(id, minx, maxx, miny, maxy);
+"""
+
+
+def connect_catalog(db_path):
+    """
+    Opens (and creates if needed) the SQLite catalog database.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+
+    # Catalogs created before failures were recorded lack the status/error columns.
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+    if "status" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE files ADD COLUMN status TEXT NOT NULL DEFAULT 'indexed'")
+            conn.execute("ALTER TABLE files ADD COLUMN error TEXT")
+    return conn
+
+
+def scan_geo_files(root_dir):
+    """
+    Recursively yields (path, os.stat_result) for geospatial files under root_dir using os.scandir.
+    """
+    try:
+        entries = list(os.scandir(root_dir))
+    except PermissionError:
+        print(f"[Permission Denied] {root_dir}")
+        return
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if "site-packages" not in entry.path:
+                yield from scan_geo_files(entry.path)
+        elif entry.name.lower().endswith(GEO_EXTENSIONS):
+            yield entry.path, entry.stat()
+
+
+def file_checksum(file_path, block_size=1 << 20):
+    """
+    Computes the BLAKE2b checksum of a file, reading it in 1 MB blocks.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_geojson(file_path):
+    """
+    Returns True if a .json file parses as a GeoJSON object (FeatureCollection, Feature or geometry).
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            document = json.load(f)
+    except (ValueError, UnicodeDecodeError):
+        return False
+    return isinstance(document, dict) and document.get("type") in GEOJSON_TYPES
+
+
+def _delete_file_entries(conn, file_id):
+    """Removes a file and all its features from the catalog."""
+    conn.execute(
+        "DELETE FROM feature_extents WHERE id IN (SELECT id FROM features WHERE file_id = ?)", (file_id,)
+    )
+    conn.execute("DELETE FROM features WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM file_extents WHERE id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def index_file(conn, file_path, stat, checksum):
+    """
+    Reads one file and stores its CRS, feature count, file extent and per-feature extents.
+
+    Extents are stored in EPSG:4326 so every layer can be queried with the same bbox.
+    """
+    # Imported here so querying the catalog only needs the standard library.
+    from spatial_join import read_layer
+
+    gdf = read_layer(file_path)
+    crs = gdf.crs.to_string() if gdf.crs is not None else "EPSG:4326"
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+
+    bounds = gdf.geometry.bounds.to_numpy()
+    cur = conn.execute(
+        "INSERT INTO files (path, size, mtime, checksum, crs, feature_count, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (file_path, stat.st_size, stat.st_mtime, checksum, crs, len(gdf), time.time()),
+    )
+    file_id = cur.lastrowid
+
+    valid = ~gdf.geometry.is_empty.to_numpy() & ~gdf.geometry.isna().to_numpy()
+    offsets = valid.nonzero()[0]
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM features").fetchone()[0]
+    feature_ids = range(first_id, first_id + len(offsets))
+
+    conn.executemany("INSERT INTO features (id, file_id, offset) VALUES (?, ?, ?)",
+                     [(feature_id, file_id, int(offset)) for feature_id, offset in zip(feature_ids, offsets)])
+    conn.executemany("INSERT INTO feature_extents (id, minx, maxx, miny, maxy) VALUES (?, ?, ?, ?, ?)",
+                     [(feature_id, *_rtree_box(bounds[offset])) for feature_id, offset in zip(feature_ids, offsets)])
+
+    if len(offsets):
+        valid_bounds = bounds[valid]
+        box = (valid_bounds[:, 0].min(), valid_bounds[:, 1].min(), valid_bounds[:, 2].max(), valid_bounds[:, 3].max())
+        conn.execute("INSERT INTO file_extents (id, minx, maxx, miny, maxy) VALUES (?, ?, ?, ?, ?)",
+                     (file_id, *_rtree_box(box)))
+    return len(gdf)
+
+
+def _record_failure(conn, file_path, stat, checksum, error, status="failed"):
+    """
+    Stores a file that could not be indexed, so it is not read again until it changes.
+    """
+    conn.execute(
+        "INSERT INTO files (path, size, mtime, checksum, indexed_at, status, error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (file_path, stat.st_size, stat.st_mtime, checksum, time.time(), status, error),
+    )
+
+
+def _rtree_box(bounds):
+    """Reorders (minx, miny, maxx, maxy) into the (minx, maxx, miny, maxy) R-tree column order."""
+    minx, miny, maxx, maxy = (float(v) for v in bounds)
+    return minx, maxx, miny, maxy
+
+
+def crawl(root_dir, db_path="catalog.sqlite", retry_failed=False):
+    """
+    Crawls a directory tree and updates the spatial catalog incrementally.
+
+    Files whose size and modification time did not change are skipped without being opened;
+    changed files are only re-indexed if their checksum differs. Files that could not be read,
+    and .json files that are not GeoJSON, are recorded with their status and error so they are
+    not retried until they change (or retry_failed is set). Errors caused by the environment,
+    such as a missing optional dependency, are raised instead of being recorded. Files that
+    disappeared from root_dir are removed from the catalog.
+
+    Parameters:
+        root_dir (str): The root directory to scan.
+        db_path (str): Path to the SQLite catalog database.
+        retry_failed (bool): Re-index files recorded as failed even if they did not change.
+
+    Returns:
+        dict: Counts of added, updated, unchanged, removed, failed and skipped files.
+    """
+    conn = connect_catalog(db_path)
+    root_dir = os.path.abspath(root_dir)
+    known = {
+        path: (file_id, size, mtime, checksum, status)
+        for file_id, path, size, mtime, checksum, status in conn.execute(
+            "SELECT id, path, size, mtime, checksum, status FROM files WHERE substr(path, 1, ?) = ?",
+            (len(root_dir) + 1, root_dir + os.sep),
+        )
+    }
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0, "skipped": 0}
+
+    def count_unchanged(status):
+        stats["unchanged" if status == "indexed" else status] += 1
+
+    for file_path, stat in scan_geo_files(root_dir):
+        entry = known.pop(file_path, None)
+        retry = retry_failed and entry is not None and entry[4] == "failed"
+        if entry and not retry and entry[1] == stat.st_size and entry[2] == stat.st_mtime:
+            count_unchanged(entry[4])
+            continue
+
+        checksum = file_checksum(file_path)
+        if entry and not retry and entry[3] == checksum:
+            conn.execute("UPDATE files SET size = ?, mtime = ? WHERE id = ?", (stat.st_size, stat.st_mtime, entry[0]))
+            count_unchanged(entry[4])
+            continue
+
+        if entry:
+            with conn:
+                _delete_file_entries(conn, entry[0])
+
+        if file_path.lower().endswith('.json') and not is_geojson(file_path):
+            with conn:
+                _record_failure(conn, file_path, stat, checksum, "not a GeoJSON document", status="skipped")
+            stats["skipped"] += 1
+            continue
+
+        try:
+            with conn:
+                n_features = index_file(conn, file_path, stat, checksum)
+        except ENVIRONMENT_ERRORS:
+            raise
+        except Exception as e:
+            print(f"Could not index {file_path}: {e}")
+            with conn:
+                _record_failure(conn, file_path, stat, checksum, f"{type(e).__name__}: {e}")
+            stats["failed"] += 1
+            continue
+
+        stats["updated" if entry else "added"] += 1
+        print(f"Indexed {file_path} ({n_features} features)")
+
+    with conn:
+        for file_id, *_ in known.values():
+            _delete_file_entries(conn, file_id)
+            stats["removed"] += 1
+
+    conn.commit()
+    conn.close()
+    print(f"Catalog {db_path}: {stats}")
+    return stats
+
+
+def query_files(db_path, bbox):
+    """
+    Returns the catalogued files whose extent intersects a bbox, without opening any of them.
+
+    Parameters:
+        db_path (str): Path to the SQLite catalog database.
+        bbox (tuple): (minx, miny, maxx, maxy) in EPSG:4326.
+
+    Returns:
+        list: One dict per file with path, crs, feature_count and checksum.
+    """
+    minx, miny, maxx, maxy = bbox
+    conn = connect_catalog(db_path)
+    rows = conn.execute(
+        """
+        SELECT f.path, f.crs, f.feature_count, f.checksum
+        FROM file_extents e JOIN files f ON f.id = e.id
+        WHERE e.minx <= ? AND e.maxx >= ? AND e.miny <= ? AND e.maxy >= ?
+        ORDER BY f.path
+        """,
+        (maxx, minx, maxy, miny),
+    ).fetchall()
+    conn.close()
+    return [dict(zip(("path", "crs", "feature_count", "checksum"), row)) for row in rows]
+
+
+def query_features(db_path, bbox):
+    """
+    Returns, for each file, the offsets of the features whose extent intersects a bbox.
+
+    Parameters:
+        db_path (str): Path to the SQLite catalog database.
+        bbox (tuple): (minx, miny, maxx, maxy) in EPSG:4326.
+
+    Returns:
+        dict: {file path: sorted list of feature offsets}, usable with GeoDataFrame.iloc.
+    """
+    minx, miny, maxx, maxy = bbox
+    conn = connect_catalog(db_path)
+    rows = conn.execute(
+        """
+        SELECT f.path, ft.offset
+        FROM feature_extents e
+        JOIN features ft ON ft.id = e.id
+        JOIN files f ON f.id = ft.file_id
+        WHERE e.minx <= ? AND e.maxx >= ? AND e.miny <= ? AND e.maxy >= ?
+        ORDER BY f.path, ft.offset
+        """,
+        (maxx, minx, maxy, miny),
+    ).fetchall()
+    conn.close()
+
+    result = {}
+    for path, offset in rows:
+        result.setdefault(path, []).append(offset)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Spatial catalog of KML/KMZ/GeoJSON/Parquet files")
+    parser.add_argument("--db", default="catalog.sqlite", help="Path to the SQLite catalog")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = subparsers.add_parser("crawl", help="Index or refresh a directory tree")
+    crawl_parser.add_argument("root_dir")
+    crawl_parser.add_argument("--retry-failed", action="store_true", help="Re-index files that failed before")
+
+    query_parser = subparsers.add_parser("query", help="List files/features intersecting a bbox")
+    query_parser.add_argument("bbox", nargs=4, type=float, metavar=("MINX", "MINY", "MAXX", "MAXY"))
+    query_parser.add_argument("--features", action="store_true", help="Also list feature offsets")
+
+    args = parser.parse_args()
+    if args.command == "crawl":
+        crawl(args.root_dir, args.db, retry_failed=args.retry_failed)
+    elif args.features:
+        for path, offsets in query_features(args.db, args.bbox).items():
+            print(f"{path}: {len(offsets)} features {offsets[:10]}{' ...' if len(offsets) > 10 else ''}")
+    else:
+        for entry in query_files(args.db, args.bbox):
+            print(f"{entry['path']} ({entry['feature_count']} features, {entry['crs']})")
+
+### python catalog.py crawl /data/predios
+### python catalog.py query -80.1 -2.3 -79.8 -2.0 --features
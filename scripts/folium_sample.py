@@ -1,17 +1,18 @@
 import os
-import fiona
 import shutil
-import pyproj
-import folium
 
 import zipfile
 import numpy as np
 import geopandas as gpd
 
 from glob import glob
-from bs4 import BeautifulSoup
 from difflib import SequenceMatcher
-from shapely.geometry import Polygon
+
+from geometry_store import polygonal_area
+from geometry_validation import validate_and_repair
+
+# fiona and folium are imported inside the functions that need them, so importing this
+# module (e.g. from the geo CLI) does not pay for GDAL drivers or the folium/jinja stack.
 
 
 def unzip_file(zip_path, extract_to):
@@ -41,10 +42,16 @@ def convert_kmz_to_kml(kmz_file_path):
 
     raise ValueError("No KML file found inside the KMZ.")
 
-def read_kml(file_path):
+def read_kml(file_path, validate=False, report_file=None):
     """
     Reads a KML file into a GeoDataFrame.
+
+    If validate is True, geometries are checked and repaired (make_valid, Z dropped,
+    repeated points removed, orientation normalised) before being returned, and the
+    per-feature report is saved to report_file when given.
     """
+    import fiona
+
     fiona.drvsupport.supported_drivers['KML'] = 'rw'
 
     if file_path.endswith('.kmz'):
@@ -60,6 +67,9 @@ def read_kml(file_path):
     if os.path.exists('temp_kml'):
         shutil.rmtree('temp_kml')
 
+    if validate:
+        gdf, _ = validate_and_repair(gdf, report_file=report_file)
+
     return gdf, features
 
 def validate_coordinates(coord_list):
@@ -78,21 +88,18 @@ def validate_coordinates(coord_list):
 
 def calculate_area_hectares(geometry):
     """
-    Calculates the area of a geometry in hectares.
+    Calculates the area of a lon/lat geometry in hectares (polygon parts only, in UTM 17S).
     """
-    proj = pyproj.Proj(proj="utm", zone=17, ellps="WGS84", south=True)
-
-    utm_coords = [proj(*coord) for coord in geometry.exterior.coords]
-    polygon = Polygon(utm_coords)
-    area_sq_meters = polygon.area
-    return area_sq_meters / 1e4
+    return float(np.nan_to_num(polygonal_area([geometry], area_crs="EPSG:32717")[0])) / 1e4
 
-def calculate_polygon_area(file_path):
+def calculate_polygon_area(file_path, validate=False):
     """
     Reads a KML or KMZ file, calculates polygon areas in hectares, and returns a GeoDataFrame.
     """
-    gdf, _ = read_kml(file_path)
-    gdf["area_ha"] = gdf.geometry.apply(calculate_area_hectares)
+    gdf, _ = read_kml(file_path, validate=validate)
+
+    # Reproject every vertex at once; polygon parts of GeometryCollections are included.
+    gdf["area_ha"] = polygonal_area(gdf.geometry.to_numpy(), crs="EPSG:4326", area_crs="EPSG:32717") / 1e4
     return gdf
 
 def string_similarity(a, b):
@@ -122,6 +129,8 @@ def generate_html_map(gdf, output_folder, start_index=0, end_index=None):
     Returns:
         None
     """
+    import folium
+
     os.makedirs(output_folder, exist_ok=True)
 
     end_index = end_index or gdf.shape[0]
@@ -0,0 +1,157 @@
+"""
+Single command-line entry point for the geographical analysis scripts.
+
+    python geo.py convert parcels.kml --to parquet
+    python geo.py area parcels.kmz -o areas.csv --validate
+    python geo.py maps parcels.kml maps/ --static
+    python geo.py bench target.kml reference.parquet --parquet
+    python geo.py query -80.1 -2.3 -79.8 -2.0 --db catalog.sqlite --features
+
+Only argparse and the standard library are imported at startup; geopandas, fiona,
+folium, pyarrow, etc. are imported by the subcommand that needs them. Add
+--import-report to see how long each of those imports took.
+"""
+import time
+
+START = time.perf_counter()
+
+import os
+import sys
+import argparse
+import importlib
+
+IMPORT_TIMES = {}
+
+
+def lazy_import(module_name):
+    """
+    Imports a module on first use and records how long the import took.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = time.perf_counter() - start
+    return module
+
+
+def print_import_report(startup_time):
+    """Prints the startup time and the time spent in each lazy import."""
+    print(f"\nImport report (CLI startup: {startup_time * 1000:.1f} ms)", file=sys.stderr)
+    for module_name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+        print(f"  {module_name:<24} {seconds * 1000:8.1f} ms", file=sys.stderr)
+    print(f"  {'total':<24} {sum(IMPORT_TIMES.values()) * 1000:8.1f} ms", file=sys.stderr)
+
+
+def cmd_convert(args):
+    """Converts between KML/KMZ, GeoJSON and (Geo)Parquet."""
+    stem = os.path.splitext(args.input)[0]
+    output = args.output or f"{stem}.{args.to}"
+    if os.path.realpath(output) == os.path.realpath(args.input):
+        sys.exit(f"Refusing to overwrite the input file {args.input}; choose another --output")
+
+    gdf = lazy_import("spatial_join").read_layer(args.input)
+
+    if args.to == "parquet":
+        gdf.to_parquet(output, compression='snappy')
+    elif args.to == "kml":
+        lazy_import("utils").gdf_to_kml(gdf, output)
+        return
+    else:
+        gdf.to_file(output, driver="GeoJSON")
+    print(f"Converted {args.input} to {output}")
+
+
+def cmd_area(args):
+    """Computes polygon areas in hectares."""
+    gdf = lazy_import("folium_sample").calculate_polygon_area(args.input, validate=args.validate)
+    columns = [column for column in ("Name", "area_ha") if column in gdf.columns]
+    if args.output:
+        gdf[columns].to_csv(args.output, index=False)
+        print(f"Saved areas of {len(gdf)} polygons to {args.output}")
+    else:
+        print(gdf[columns].to_string())
+
+
+def cmd_maps(args):
+    """Generates one HTML (folium) or PNG (static) map per polygon."""
+    gdf, _ = lazy_import("folium_sample").read_kml(args.input, validate=args.validate)
+    if args.static:
+        gdf = gdf.iloc[args.start:args.end]
+        lazy_import("static_render").render_thumbnails(gdf, args.output_folder, workers=args.workers)
+    else:
+        lazy_import("folium_sample").generate_html_map(gdf, args.output_folder, args.start, args.end)
+
+
+def cmd_bench(args):
+    """Benchmarks load and spatial query time for KML/GeoJSON vs Parquet."""
+    lazy_import("utils").benchmark_spatial_query(args.target_file, args.reference_file, use_parquet=args.parquet)
+
+
+def cmd_query(args):
+    """Lists catalogued files (and feature offsets) intersecting a bbox."""
+    catalog = lazy_import("catalog")
+    if args.features:
+        for path, offsets in catalog.query_features(args.db, args.bbox).items():
+            print(f"{path}: {len(offsets)} features")
+    else:
+        for entry in catalog.query_files(args.db, args.bbox):
+            print(f"{entry['path']} ({entry['feature_count']} features, {entry['crs']})")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--import-report", action="store_true", help="Print the time spent importing libraries")
+
+    parser = argparse.ArgumentParser(prog="geo", description="Geographical analysis tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert KML/KMZ/GeoJSON/Parquet files", parents=[common])
+    convert.add_argument("input")
+    convert.add_argument("--to", choices=["parquet", "kml", "geojson"], default="parquet")
+    convert.add_argument("-o", "--output", default=None)
+    convert.set_defaults(func=cmd_convert)
+
+    area = subparsers.add_parser("area", help="Polygon areas in hectares", parents=[common])
+    area.add_argument("input", help="KML or KMZ file")
+    area.add_argument("-o", "--output", default=None, help="CSV file (prints to stdout if omitted)")
+    area.add_argument("--validate", action="store_true", help="Validate and repair geometries first")
+    area.set_defaults(func=cmd_area)
+
+    maps = subparsers.add_parser("maps", help="One map per polygon", parents=[common])
+    maps.add_argument("input", help="KML or KMZ file")
+    maps.add_argument("output_folder")
+    maps.add_argument("--start", type=int, default=0)
+    maps.add_argument("--end", type=int, default=None)
+    maps.add_argument("--static", action="store_true", help="Render PNG thumbnails instead of HTML")
+    maps.add_argument("--workers", type=int, default=None)
+    maps.add_argument("--validate", action="store_true", help="Validate and repair geometries first")
+    maps.set_defaults(func=cmd_maps)
+
+    bench = subparsers.add_parser("bench", help="Benchmark KML/GeoJSON vs Parquet spatial queries", parents=[common])
+    bench.add_argument("target_file")
+    bench.add_argument("reference_file")
+    bench.add_argument("--parquet", action="store_true", help="Read the reference file as Parquet")
+    bench.set_defaults(func=cmd_bench)
+
+    query = subparsers.add_parser("query", help="Query the spatial catalog by bbox", parents=[common])
+    query.add_argument("bbox", nargs=4, type=float, metavar=("MINX", "MINY", "MAXX", "MAXY"))
+    query.add_argument("--db", default="catalog.sqlite")
+    query.add_argument("--features", action="store_true", help="List feature offsets per file")
+    query.set_defaults(func=cmd_query)
+
+    return parser
+
+
+def main(argv=None):
+    startup_time = time.perf_counter() - START
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        if args.import_report:
+            print_import_report(startup_time)
+
+
+if __name__ == "__main__":
+    main()
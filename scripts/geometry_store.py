@@ -0,0 +1,251 @@
+import shapely
+
+import numpy as np
+import geopandas as gpd
+
+from pyproj import Transformer
+
+from geometry_validation import polygon_parts
+
+POLYGONAL = (shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON)
+
+
+class GeometryStore:
+    """
+    Compact, array-backed container for a homogeneous geometry column (GeoArrow layout).
+
+    Coordinates live in a single contiguous (N, 2) float64 or float32 array and the
+    structure is described by offset arrays, as returned by shapely.to_ragged_array:
+
+        Point:            ()
+        LineString:       (geom -> coords,)
+        Polygon:          (ring -> coords, geom -> rings)
+        MultiLineString:  (line -> coords, geom -> lines)
+        MultiPolygon:     (ring -> coords, polygon -> rings, geom -> polygons)
+
+    There is one Python object per layer instead of one per vertex, and bounds, centroid,
+    area and reprojection run as NumPy operations over the whole coordinate array.
+    float32 halves memory again but limits lon/lat precision to about 1 m; reprojected
+    stores are float64, and areas and centroids are always computed in float64 relative to
+    each geometry's first vertex.
+
+    Missing (None) geometries are not supported; drop them before building the store.
+    """
+
+    def __init__(self, geom_type, coords, offsets, crs=None):
+        self.geom_type = shapely.GeometryType(geom_type)
+        self.coords = np.ascontiguousarray(coords)
+        self.offsets = tuple(np.asarray(offset, dtype=np.int64) for offset in offsets)
+        self.crs = crs
+
+    @classmethod
+    def from_shapely(cls, geoms, crs=None, dtype=np.float64):
+        """
+        Builds a store from an array of shapely geometries of a single family
+        (e.g. Polygon and MultiPolygon together), ignoring Z coordinates. Empty geometries
+        are kept (as empty Multi* geometries when the store is Multi*).
+        """
+        geoms = np.asarray(geoms, dtype=object)
+
+        # An empty Polygon/LineString promoted to a Multi* store produces offsets that make
+        # shapely.from_ragged_array crash, so empties take the Multi* type up front.
+        type_id, empty = shapely.get_type_id(geoms), shapely.is_empty(geoms)
+        for single, multi, empty_multi in ((3, 6, shapely.MultiPolygon()), (1, 5, shapely.MultiLineString())):
+            promote = empty & (type_id == single)
+            if promote.any() and (type_id == multi).any():
+                geoms = geoms.copy()
+                geoms[promote] = empty_multi
+
+        geom_type, coords, offsets = shapely.to_ragged_array(geoms, include_z=False)
+        return cls(geom_type, coords.astype(dtype, copy=False), offsets, crs)
+
+    @classmethod
+    def from_geoseries(cls, geoseries, dtype=np.float64):
+        """
+        Builds a store from a GeoSeries (or the active geometry of a GeoDataFrame), keeping its CRS.
+        """
+        if isinstance(geoseries, gpd.GeoDataFrame):
+            geoseries = geoseries.geometry
+        return cls.from_shapely(geoseries.to_numpy(), crs=geoseries.crs, dtype=dtype)
+
+    def to_shapely(self):
+        """Returns the geometries as a NumPy array of shapely objects."""
+        return shapely.from_ragged_array(self.geom_type, self.coords.astype(np.float64, copy=False), self.offsets or None)
+
+    def to_geoseries(self, index=None):
+        """Returns the geometries as a GeoSeries with the store CRS."""
+        return gpd.GeoSeries(self.to_shapely(), index=index, crs=self.crs)
+
+    def __len__(self):
+        return len(self.coords) if not self.offsets else len(self.offsets[-1]) - 1
+
+    @property
+    def nbytes(self):
+        """Memory used by the coordinate and offset arrays, in bytes."""
+        return self.coords.nbytes + sum(offset.nbytes for offset in self.offsets)
+
+    @property
+    def coord_offsets(self):
+        """Offsets of each geometry into the coordinate array (length n + 1)."""
+        index = np.arange(len(self) + 1)
+        for offset in reversed(self.offsets):
+            index = offset[index]
+        return index
+
+    def geometry_coords(self):
+        """Returns one (n_vertices, 2) view of the coordinate array per geometry."""
+        return np.split(self.coords, self.coord_offsets[1:-1])
+
+    def bounds(self):
+        """
+        Per-geometry bounds as an (n, 4) float64 array of (minx, miny, maxx, maxy);
+        empty geometries get NaN.
+        """
+        offsets = self.coord_offsets
+        nonempty = np.diff(offsets) > 0
+        result = np.full((len(self), 4), np.nan)
+        if nonempty.any():
+            starts = offsets[:-1][nonempty]
+            result[nonempty, :2] = np.minimum.reduceat(self.coords, starts, axis=0)
+            result[nonempty, 2:] = np.maximum.reduceat(self.coords, starts, axis=0)
+        return result
+
+    def total_bounds(self):
+        """Bounds of the whole layer as (minx, miny, maxx, maxy)."""
+        if len(self.coords) == 0:
+            return np.full(4, np.nan)
+        return np.concatenate([self.coords.min(axis=0), self.coords.max(axis=0)]).astype(np.float64)
+
+    def _local_coords(self):
+        """Coordinates (float64) relative to the first vertex of their geometry, plus that origin."""
+        offsets = self.coord_offsets
+        counts = np.diff(offsets)
+        first = np.minimum(offsets[:-1], max(len(self.coords) - 1, 0))
+        origin = self.coords[first].astype(np.float64) if len(self.coords) else np.zeros((len(self), 2))
+        local = self.coords.astype(np.float64) - np.repeat(origin, counts, axis=0)
+        return local, origin
+
+    def _ring_structure(self):
+        """Returns (ring_offsets, exterior flag per ring, geometry index per ring) for polygonal stores."""
+        if self.geom_type == shapely.GeometryType.POLYGON:
+            ring_offsets, geom_rings = self.offsets
+            polygon_rings = geom_rings
+        elif self.geom_type == shapely.GeometryType.MULTIPOLYGON:
+            ring_offsets, polygon_rings, geom_polygons = self.offsets
+            geom_rings = polygon_rings[geom_polygons]
+        else:
+            raise ValueError(f"area/centroid need polygonal geometries, got {self.geom_type.name}")
+
+        n_rings = len(ring_offsets) - 1
+        exterior = np.zeros(n_rings, dtype=bool)
+        exterior[polygon_rings[:-1][np.diff(polygon_rings) > 0]] = True
+        ring_geom = np.repeat(np.arange(len(self)), np.diff(geom_rings))
+        return ring_offsets, exterior, ring_geom
+
+    def _ring_sums(self, values, ring_offsets):
+        """
+        Sums `values[i]` (defined on the edge from vertex i to i + 1) over the edges of each ring.
+        reduceat keeps a NaN/inf coordinate from leaking into other rings.
+        """
+        starts, ends = ring_offsets[:-1], ring_offsets[1:]
+        edges = np.zeros(len(self.coords))
+        edges[:len(values)] = values
+        # The edge from a ring's last vertex to the next ring's first vertex is not part of either ring.
+        edges[ends[ends > starts] - 1] = 0.0
+
+        result = np.zeros(len(starts))
+        nonempty = ends > starts
+        if nonempty.any():
+            result[nonempty] = np.add.reduceat(edges, starts[nonempty])
+        return result
+
+    def _area_and_moments(self):
+        """Signed (exterior +, holes -) area and first moments per geometry, in local coordinates."""
+        local, origin = self._local_coords()
+        ring_offsets, exterior, ring_geom = self._ring_structure()
+
+        x, y = local[:, 0], local[:, 1]
+        cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+        ring_area = 0.5 * self._ring_sums(cross, ring_offsets)
+        ring_mx = self._ring_sums((x[:-1] + x[1:]) * cross, ring_offsets) / 6.0
+        ring_my = self._ring_sums((y[:-1] + y[1:]) * cross, ring_offsets) / 6.0
+
+        # Orientation from the source data is not trusted: exteriors add, holes subtract.
+        sign = np.where(exterior, 1.0, -1.0) * np.sign(ring_area)
+        n = len(self)
+        area = np.bincount(ring_geom, weights=ring_area * sign, minlength=n)
+        mx = np.bincount(ring_geom, weights=ring_mx * sign, minlength=n)
+        my = np.bincount(ring_geom, weights=ring_my * sign, minlength=n)
+        return area, mx, my, origin
+
+    def area(self):
+        """
+        Planar area of each polygonal geometry in CRS units squared (holes subtracted).
+        Project to a metric CRS first (e.g. store.to_crs("EPSG:32717")) to get m².
+        """
+        area, _, _, _ = self._area_and_moments()
+        return area
+
+    def centroid(self):
+        """
+        Per-geometry centroid as an (n, 2) float64 array. Polygonal stores use the
+        area-weighted centroid; other types (and degenerate polygons) the vertex mean.
+        """
+        offsets = self.coord_offsets
+        counts = np.diff(offsets)
+        geom_index = np.repeat(np.arange(len(self)), counts)
+        local, origin = self._local_coords()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.column_stack([
+                np.bincount(geom_index, weights=local[:, 0], minlength=len(self)) / counts,
+                np.bincount(geom_index, weights=local[:, 1], minlength=len(self)) / counts,
+            ])
+
+            if self.geom_type not in POLYGONAL:
+                return origin + mean
+
+            area, mx, my, origin = self._area_and_moments()
+            weighted = np.column_stack([mx / area, my / area])
+        return origin + np.where((area != 0)[:, None], weighted, mean)
+
+    def to_crs(self, crs):
+        """
+        Reprojects all coordinates in one vectorized pyproj call and returns a new store
+        sharing the same offset arrays. The result is always float64: projected coordinates
+        such as UTM northings (~1e7 m) would be rounded to 1 m steps in float32.
+        """
+        if self.crs is None:
+            raise ValueError("Cannot reproject a store without a CRS")
+        transformer = Transformer.from_crs(self.crs, crs, always_xy=True)
+        x, y = transformer.transform(self.coords[:, 0].astype(np.float64), self.coords[:, 1].astype(np.float64))
+        coords = np.column_stack([x, y]).astype(np.float64, copy=False)
+        return GeometryStore(self.geom_type, coords, self.offsets, crs)
+
+    def __repr__(self):
+        return (f"GeometryStore({self.geom_type.name}, {len(self)} geometries, {len(self.coords)} coords, "
+                f"{self.coords.dtype}, {self.nbytes / 1e6:.1f} MB)")
+
+
+def polygonal_area(geoms, crs="EPSG:4326", area_crs="EPSG:32717"):
+    """
+    Area of the polygon parts of each geometry, in `area_crs` units (m² for UTM).
+
+    MultiPolygons and the GeometryCollections produced by make_valid are exploded with
+    polygon_parts, so lines or points mixed with polygons do not make the whole row NaN.
+
+    Parameters:
+        geoms (array-like): Shapely geometries (None allowed).
+        crs: CRS of the input geometries.
+        area_crs: Equal-area or local metric CRS the areas are measured in.
+
+    Returns:
+        numpy.ndarray: One float64 area per geometry; NaN where there is no polygon part.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    parts, index = polygon_parts(geoms)
+    area = np.full(len(geoms), np.nan)
+    if len(parts):
+        part_area = GeometryStore.from_shapely(parts, crs=crs).to_crs(area_crs).area()
+        has_parts = np.bincount(index, minlength=len(geoms)) > 0
+        area[has_parts] = np.bincount(index, weights=part_area, minlength=len(geoms))[has_parts]
+    return area
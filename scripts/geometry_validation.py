@@ -0,0 +1,239 @@
+import os
+import shapely
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import polygon
+
+
+def validate_geometries(geoms):
+    """
+    Checks an array of geometries with shapely 2 vectorized functions.
+
+    Parameters:
+        geoms (array-like): Shapely geometries (NumPy array, GeoSeries values, list...).
+
+    Returns:
+        DataFrame: One row per geometry with is_valid, reason, has_z and n_points columns.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    return pd.DataFrame({
+        "is_valid": shapely.is_valid(geoms),
+        "reason": shapely.is_valid_reason(geoms),
+        "has_z": shapely.has_z(geoms),
+        "n_points": shapely.get_num_coordinates(geoms),
+    })
+
+
+def repair_geometries(geoms, drop_z=True, tolerance=0.0, orient=True):
+    """
+    Repairs an array of geometries in a single vectorized pass.
+
+    Steps:
+        1. Drops the Z coordinate (GPS altitude noise) if drop_z is True.
+        2. Removes repeated consecutive points (duplicate closing points, GPS jitter
+           within `tolerance` units); rings left with too few points become empty.
+        3. Fixes invalid geometries (self-intersections, bow-ties...) with make_valid. Polygons
+           stay polygonal: parts that collapse to lines or points are dropped, and a polygon
+           that collapses entirely becomes an empty polygon.
+        4. Normalises ring orientation (exterior counter-clockwise, holes clockwise).
+
+    Parameters:
+        geoms (array-like): Shapely geometries.
+        drop_z (bool): Whether to force 2D coordinates.
+        tolerance (float): Distance under which consecutive points are considered repeated.
+        orient (bool): Whether to normalise polygon orientation.
+
+    Returns:
+        numpy.ndarray: Repaired geometries, same length and order as the input.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+
+    if drop_z:
+        geoms = shapely.force_2d(geoms)
+    geoms = remove_repeated_points(geoms, tolerance=tolerance)
+
+    invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    polygonal = np.isin(shapely.get_type_id(geoms), (3, 6))  # Polygon, MultiPolygon
+    if (invalid & polygonal).any():
+        geoms[invalid & polygonal] = make_valid_polygons(geoms[invalid & polygonal])
+    if (invalid & ~polygonal).any():
+        geoms[invalid & ~polygonal] = shapely.make_valid(geoms[invalid & ~polygonal])
+
+    if orient:
+        polygonal = np.isin(shapely.get_type_id(geoms), (3, 6))  # Polygon, MultiPolygon
+        geoms[polygonal] = orient_polygons(geoms[polygonal])
+    return geoms
+
+
+def remove_repeated_points(geoms, tolerance=0.0):
+    """
+    shapely.remove_repeated_points that does not fail on degenerate input.
+
+    GEOS raises when removing points leaves a ring with fewer than 4 coordinates (e.g. a GPS
+    polygon whose vertices are all the same point); those geometries are returned as an empty
+    geometry of the same family instead, so the repair report flags them as collapsed.
+    """
+    try:
+        return shapely.remove_repeated_points(geoms, tolerance=tolerance)
+    except shapely.errors.GEOSException:
+        pass
+
+    result = geoms.copy()
+    for i, geom in enumerate(geoms):
+        try:
+            result[i] = shapely.remove_repeated_points(geom, tolerance=tolerance)
+        except shapely.errors.GEOSException:
+            result[i] = shapely.Polygon() if shapely.get_type_id(geom) in (3, 6) else shapely.LineString()
+    return result
+
+
+def make_valid_polygons(geoms):
+    """
+    Repairs invalid polygons while keeping the output polygonal.
+
+    Uses make_valid(method="structure", keep_collapsed=False) when available (shapely >= 2.1
+    with GEOS >= 3.10); otherwise the default make_valid result is reduced to its polygon parts.
+    """
+    try:
+        return shapely.make_valid(geoms, method="structure", keep_collapsed=False)
+    except (TypeError, ValueError):
+        return polygonal_only(shapely.make_valid(geoms))
+
+
+def polygon_parts(geoms):
+    """
+    Explodes geometries into their Polygon parts, looking inside MultiPolygons and (nested)
+    GeometryCollections; lines and points are discarded.
+
+    Returns:
+        tuple: (polygons, index) NumPy arrays sorted by index, where index is the input
+        position of each part.
+    """
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    while True:
+        nested = np.isin(shapely.get_type_id(parts), (6, 7))  # MultiPolygon, GeometryCollection
+        if not nested.any():
+            break
+        sub_parts, sub_index = shapely.get_parts(parts[nested], return_index=True)
+        parts = np.concatenate([parts[~nested], sub_parts])
+        index = np.concatenate([index[~nested], index[nested][sub_index]])
+
+    keep = (shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)
+    order = np.argsort(index[keep], kind="stable")
+    return parts[keep][order], index[keep][order]
+
+
+def polygonal_only(geoms):
+    """
+    Keeps only the polygon parts of each geometry: one part gives a Polygon, several a
+    MultiPolygon and none an empty Polygon.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    parts, index = polygon_parts(geoms)
+    result = np.array([shapely.Polygon()] * len(geoms), dtype=object)
+
+    counts = np.bincount(index, minlength=len(geoms))
+    single = counts[index] == 1
+    result[index[single]] = parts[single]
+    if (counts > 1).any():
+        multi = np.flatnonzero(counts > 1)
+        result[multi] = shapely.multipolygons(parts[~single], indices=np.searchsorted(multi, index[~single]))
+    return result
+
+
+def orient_polygons(geoms):
+    """
+    Orients polygon rings: exterior counter-clockwise, interiors clockwise.
+
+    Uses shapely.orient_polygons when available (shapely >= 2.1).
+    """
+    if hasattr(shapely, "orient_polygons"):
+        return shapely.orient_polygons(geoms)
+
+    def orient(geom):
+        if geom.geom_type == "MultiPolygon":
+            return shapely.MultiPolygon([polygon.orient(part) for part in geom.geoms])
+        return polygon.orient(geom)
+
+    return np.array([orient(geom) for geom in geoms], dtype=object)
+
+
+def _validate_and_repair_chunk(task):
+    """Validates, repairs and re-validates one chunk of geometries."""
+    start, geoms, drop_z, tolerance, orient = task
+    before = validate_geometries(geoms)
+    repaired = repair_geometries(geoms, drop_z=drop_z, tolerance=tolerance, orient=orient)
+    after_valid = shapely.is_valid(repaired)
+    missing = shapely.is_missing(geoms)
+
+    report = pd.DataFrame({
+        "feature": np.arange(start, start + len(geoms)),
+        "was_valid": before["is_valid"].to_numpy(),
+        "reason": before["reason"].to_numpy(),
+        "had_z": before["has_z"].to_numpy(),
+        "points_before": before["n_points"].to_numpy(),
+        "points_after": shapely.get_num_coordinates(repaired),
+        "type_before": shapely.get_type_id(geoms),
+        "type_after": shapely.get_type_id(repaired),
+        "is_valid": after_valid,
+        "missing": missing,
+        "collapsed": ~missing & ~shapely.is_empty(geoms) & shapely.is_empty(repaired),
+    })
+    report["changed"] = ~missing & ~shapely.equals_exact(np.asarray(geoms, dtype=object), repaired, tolerance=0)
+    return start, repaired, report
+
+
+def validate_and_repair(gdf, drop_z=True, tolerance=0.0, orient=True, chunk_size=50000, workers=None, report_file=None):
+    """
+    Validates and repairs every geometry of a GeoDataFrame before area or map computations.
+
+    Geometries are processed in chunks of `chunk_size` across a process pool (or in the
+    current process when there is a single chunk or workers=1).
+
+    Parameters:
+        gdf (GeoDataFrame): Input GeoDataFrame.
+        drop_z (bool): Whether to drop Z coordinates.
+        tolerance (float): Distance under which consecutive points are considered repeated.
+        orient (bool): Whether to normalise polygon orientation.
+        chunk_size (int): Number of geometries per task.
+        workers (int): Number of worker processes (defaults to os.cpu_count()).
+        report_file (str): Optional CSV path where the per-feature report is saved.
+
+    Returns:
+        tuple: (repaired GeoDataFrame, per-feature report DataFrame).
+    """
+    geoms = gdf.geometry.to_numpy()
+    tasks = [
+        (start, geoms[start:start + chunk_size], drop_z, tolerance, orient)
+        for start in range(0, len(geoms), chunk_size)
+    ] or [(0, geoms, drop_z, tolerance, orient)]
+
+    if len(tasks) <= 1 or workers == 1:
+        results = [_validate_and_repair_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = list(executor.map(_validate_and_repair_chunk, tasks))
+
+    repaired = gdf.copy()
+    repaired[gdf.geometry.name] = np.concatenate([geoms for _, geoms, _ in results])
+    report = pd.concat([report for _, _, report in results], ignore_index=True)
+    report.index = gdf.index
+
+    # Missing (None) geometries are reported but neither counted as invalid nor as repaired.
+    present = ~report["missing"]
+    n_invalid = int((~report["was_valid"] & present).sum())
+    n_changed = int(report["changed"].sum())
+    n_still_invalid = int((~report["is_valid"] & present).sum())
+    n_collapsed = int(report["collapsed"].sum())
+    print(f"Validated {len(report)} geometries: {n_invalid} invalid, {n_changed} repaired, "
+          f"{n_collapsed} collapsed, {n_still_invalid} still invalid, {int(report['missing'].sum())} missing")
+
+    if report_file:
+        report.to_csv(report_file)
+        print(f"Validation report saved: {report_file}")
+
+    return gpd.GeoDataFrame(repaired, geometry=gdf.geometry.name, crs=gdf.crs), report
@@ -1,14 +1,16 @@
 import geopandas as gpd
 from keplergl import KeplerGl
 
+from arrow_export import add_arrow_data
+
 gdf = gpd.read_file("Centros Comerciales.kml")
 gdf.head()
 
 # Initialize a Kepler.gl map
 map_1 = KeplerGl(height=600)
 
-# Add a dataset (e.g., GeoJSON or Pandas DataFrame)
-map_1.add_data(data=gdf, name="My Data")
+# Add the dataset as an Arrow payload (much smaller and faster to parse than GeoJSON/CSV text)
+add_arrow_data(map_1, gdf, name="My Data")
 
 # Define the latitude, longitude, and zoom level for centering
 center_lat = -2.1409155511014633  # Replace with your latitude
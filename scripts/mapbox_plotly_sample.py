@@ -2,6 +2,8 @@ import geopandas as gpd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from arrow_export import plotly_polygon_trace, plotly_hole_trace
+
 # Mapbox Access Token
 mapbox_token = ""
 px.set_mapbox_access_token(mapbox_token)
@@ -10,23 +12,9 @@ gdf = gpd.read_file("Centros Comerciales.kml")
 gdf = set_elevation_column(gdf, column_name='DN', num_elevations=1, min_elevation=50, max_elevation=300)
 gdf
 
-coords = list(gdf.geometry.iloc[0].boundary.coords)
-coords
-
 lat_c, lon_c = list(gdf.geometry.iloc[0].centroid.coords)[0][::-1]
 lat_c, lon_c
 
-# Example Data for Polygons (Deforestation Polygons)
-polygon_data = {
-    "lat": [i[1] for i in coords],
-    "lon": [i[0] for i in coords],
-    "category": ["Deforestation"]*len(coords)
-}
-
-# Convert to DataFrame
-polygon_df = pd.DataFrame(polygon_data)
-polygon_df
-
 # Center Coordinates
 center_coordinates = {"lat": lat_c, "lon": lon_c}
 center_coordinates
@@ -34,21 +22,22 @@ center_coordinates
 # Create the Figure
 fig = go.Figure()
 
-# Add the Polygon as a Line
+# Add all polygons as a single trace built from NumPy arrays (NaN-separated rings)
 fig.add_trace(
-    go.Scattermapbox(
-        lat=polygon_data["lat"],
-        lon=polygon_data["lon"],
-        # mode="lines+markers+text",
-        # line=dict(width=2, color="red"),
-        marker=dict(size=4, color="red"),
-        text=[f"Point {i}" for i in range(nn)],  # Labels for the points
-        fill="toself",  # Fill the polygon
+    plotly_polygon_trace(
+        gdf,
+        name_column="Name",
+        name="Deforestation Polygon",
+        line=dict(width=2, color="red"),
         fillcolor="rgba(255, 0, 0, 0.3)",  # Color with transparency
-        name="Deforestation Polygon"
     )
 )
 
+# Holes are outlined in a separate line-only trace (Plotly cannot cut them out of a filled trace)
+holes = plotly_hole_trace(gdf, name_column="Name", name="Holes", line=dict(width=2, color="red"))
+if holes is not None:
+    fig.add_trace(holes)
+
 # Mapbox Settings
 fig.update_layout(
     mapbox=dict(
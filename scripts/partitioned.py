@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import shutil
+import shapely
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from geometry_store import polygonal_area
+from geometry_validation import validate_and_repair
+from spatial_join import OPERATIONS as JOIN_OPERATIONS, bounded_map, iter_chunks, iter_parquet_chunks, load_unless_parquet
+
+MANIFEST = "_partitions.json"
+
+
+def quadtree_cells(geoms, crs, level):
+    """
+    Returns the (x, y) Web Mercator quadtree cell (XYZ tile) at `level` of each geometry,
+    using the centre of its bounding box.
+    """
+    bounds = shapely.bounds(geoms)
+    centers = gpd.GeoSeries(shapely.points((bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2), crs=crs)
+    if crs is not None and not centers.crs.equals("EPSG:4326"):
+        centers = centers.to_crs("EPSG:4326")
+
+    lon = np.nan_to_num(centers.x.to_numpy())
+    lat = np.clip(np.nan_to_num(centers.y.to_numpy()), -85.0511, 85.0511)
+    n = 2 ** level
+    x = np.clip(((lon + 180.0) / 360.0 * n).astype(np.int64), 0, n - 1)
+    lat_rad = np.radians(lat)
+    y = np.clip(((1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * n).astype(np.int64), 0, n - 1)
+    return x, y
+
+
+def _format_keys(level, x, y):
+    """Formats cell keys like "6_18_32" (level_x_y); level may be a scalar or an array."""
+    level = np.broadcast_to(np.asarray(level), np.shape(x)).astype(str)
+    return np.char.add(np.char.add(np.char.add(level, "_"), np.asarray(x).astype(str)), np.char.add("_", np.asarray(y).astype(str)))
+
+
+def quadtree_keys(geoms, crs, level=6):
+    """
+    Assigns each geometry to a Web Mercator quadtree cell (XYZ tile) at `level`,
+    using the centre of its bounding box.
+
+    Returns:
+        numpy.ndarray: Keys like "6_18_32" (level_x_y), one per geometry.
+    """
+    x, y = quadtree_cells(geoms, crs, level)
+    return _format_keys(level, x, y)
+
+
+def plan_quadtree(x, y, counts, level, max_level, max_rows):
+    """
+    Builds an adaptive quadtree from row counts per cell at `max_level`.
+
+    Cells start at `level` and are split into their four children while they hold more
+    than `max_rows` rows, down to `max_level` (a single dense cell can still exceed max_rows).
+
+    Parameters:
+        x, y (numpy.ndarray): Occupied cells at max_level.
+        counts (numpy.ndarray): Rows in each of those cells.
+        level (int): Coarsest level.
+        max_level (int): Finest level.
+        max_rows (int): Split threshold.
+
+    Returns:
+        numpy.ndarray: The partition key of each (x, y) cell.
+    """
+    keys = np.empty(len(x), dtype=object)
+    pending = np.arange(len(x))
+    max_level = max(level, max_level)
+    for current in range(level, max_level + 1):
+        shift = max_level - current
+        cell_x, cell_y = x[pending] >> shift, y[pending] >> shift
+        cells, cell_index = np.unique(np.stack([cell_x, cell_y], axis=1), axis=0, return_inverse=True)
+        cell_index = cell_index.ravel()
+        cell_rows = np.bincount(cell_index, weights=counts[pending], minlength=len(cells))
+
+        leaf = (cell_rows <= max_rows)[cell_index] if current < max_level else np.ones(len(pending), dtype=bool)
+        keys[pending[leaf]] = _format_keys(current, cell_x[leaf], cell_y[leaf])
+        pending = pending[~leaf]
+        if not len(pending):
+            break
+    return keys.astype(str)
+
+
+def _clean_chunk(chunk):
+    """Sets the default CRS and drops missing/empty geometries before partitioning."""
+    if chunk.crs is None:
+        chunk = chunk.set_crs("EPSG:4326")
+    return chunk[~(chunk.geometry.isna() | chunk.geometry.is_empty)]
+
+
+def _cell_codes(x, y, max_level):
+    """Encodes (x, y) cells at max_level as single int64 codes."""
+    return x * (2 ** max_level) + y
+
+
+def count_cells(input_layer, max_level, chunk_size=100000):
+    """
+    First pass of an adaptive partitioning: counts rows per quadtree cell at `max_level`,
+    reading only the geometry column of GeoParquet inputs.
+
+    Returns:
+        tuple: (sorted cell codes, row count of each cell).
+    """
+    if isinstance(input_layer, str):
+        chunks = iter_parquet_chunks(input_layer, chunk_size, columns=[])
+    else:
+        chunks = iter_chunks(input_layer, chunk_size)
+
+    codes, counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    for chunk in chunks:
+        chunk = _clean_chunk(chunk)
+        x, y = quadtree_cells(chunk.geometry.to_numpy(), chunk.crs, max_level)
+        chunk_codes, chunk_counts = np.unique(_cell_codes(x, y, max_level), return_counts=True)
+        codes, index = np.unique(np.concatenate([codes, chunk_codes]), return_inverse=True)
+        counts = np.bincount(index.ravel(), weights=np.concatenate([counts, chunk_counts]), minlength=len(codes)).astype(np.int64)
+    return codes, counts
+
+
+def clear_dataset(output_dir):
+    """
+    Creates output_dir if needed and removes the `key=*` partitions and manifest of a
+    previous run, so stale parts are never read back with the new ones.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name.startswith("key=") and os.path.isdir(path):
+            shutil.rmtree(path)
+        elif name == MANIFEST:
+            os.remove(path)
+
+
+def lonlat_bounds(gdf):
+    """Per-feature bounds of a GeoDataFrame in EPSG:4326, as an (n, 4) array."""
+    bounds = gdf.geometry.bounds.to_numpy()
+    if gdf.crs is None or gdf.crs.equals("EPSG:4326"):
+        return bounds
+    boxes = gpd.GeoSeries(shapely.box(*bounds.T), crs=gdf.crs).to_crs("EPSG:4326")
+    return boxes.bounds.to_numpy()
+
+
+def _merge_bounds(a, b):
+    if a is None:
+        return b
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def partition_extent(gdf):
+    """EPSG:4326 extent [minx, miny, maxx, maxy] of a GeoDataFrame."""
+    bounds = lonlat_bounds(gdf)
+    return [float(np.nanmin(bounds[:, 0])), float(np.nanmin(bounds[:, 1])),
+            float(np.nanmax(bounds[:, 2])), float(np.nanmax(bounds[:, 3]))]
+
+
+def _update_manifest(manifest, key, rows, extent):
+    """Adds the row count and extent of a partition piece to the manifest."""
+    entry = manifest["partitions"].setdefault(key, {"rows": 0, "bounds": None})
+    entry["rows"] += rows
+    entry["bounds"] = _merge_bounds(entry["bounds"], extent)
+
+
+def write_manifest(dataset_dir, manifest):
+    with open(os.path.join(dataset_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(dataset_dir):
+    with open(os.path.join(dataset_dir, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def partition_path(dataset_dir, key):
+    return os.path.join(dataset_dir, f"key={key}")
+
+
+def partition_dataset(input_layer, output_dir, level=6, chunk_size=100000, max_rows=200000, max_level=14):
+    """
+    Splits a layer into quadtree partitions stored as GeoParquet, streaming the input in chunks.
+
+    Each partition is a folder `key=<level>_<x>_<y>` holding one part file per input chunk,
+    and `_partitions.json` records the row count and EPSG:4326 extent of every partition
+    (features that cross cell edges widen the extent, which keeps joins exact).
+
+    With `max_rows` the quadtree is adaptive: a first pass counts rows per cell at `max_level`
+    and cells are split from `level` down until they hold at most `max_rows` rows, so dense
+    cities get small cells and empty regions large ones. max_rows=None uses a fixed `level`.
+
+    Parameters:
+        input_layer (GeoDataFrame or str): Layer or path (GeoParquet is streamed row group by row group).
+        output_dir (str): Folder of the partitioned dataset; partitions of a previous run are removed.
+        level (int): Coarsest quadtree level (6 gives cells of about 600 km, 10 about 40 km at the equator).
+        chunk_size (int): Rows read at a time.
+        max_rows (int): Maximum rows per partition, or None for a fixed level.
+        max_level (int): Finest level cells are split to (14 is about 2.4 km at the equator).
+
+    Returns:
+        dict: The manifest.
+    """
+    clear_dataset(output_dir)
+    input_layer = load_unless_parquet(input_layer)
+    manifest = {"level": level, "max_rows": max_rows, "crs": None, "partitions": {}}
+    start_time = time.time()
+    total_rows = 0
+
+    if max_rows is not None:
+        codes, counts = count_cells(input_layer, max_level, chunk_size)
+        cell_keys = plan_quadtree(codes // (2 ** max_level), codes % (2 ** max_level), counts, level, max_level, max_rows)
+        print(f"Planned {len(set(cell_keys))} partitions from {counts.sum()} rows "
+              f"({time.time() - start_time:.1f} sec)")
+
+    for chunk_index, chunk in enumerate(iter_chunks(input_layer, chunk_size)):
+        chunk = _clean_chunk(chunk)
+        manifest["crs"] = chunk.crs.to_string()
+
+        if max_rows is None:
+            keys = quadtree_keys(chunk.geometry.to_numpy(), chunk.crs, level)
+        else:
+            x, y = quadtree_cells(chunk.geometry.to_numpy(), chunk.crs, max_level)
+            keys = cell_keys[np.searchsorted(codes, _cell_codes(x, y, max_level))]
+
+        for key, piece in chunk.groupby(keys, sort=False):
+            folder = partition_path(output_dir, key)
+            os.makedirs(folder, exist_ok=True)
+            piece.to_parquet(os.path.join(folder, f"part-{chunk_index:05d}.parquet"), compression='snappy')
+            _update_manifest(manifest, key, len(piece), partition_extent(piece))
+
+        total_rows += len(chunk)
+        print(f"Partitioned {total_rows} rows into {len(manifest['partitions'])} partitions "
+              f"({time.time() - start_time:.1f} sec)")
+
+    write_manifest(output_dir, manifest)
+    return manifest
+
+
+def read_partition(dataset_dir, key):
+    """Reads one partition into a GeoDataFrame."""
+    return gpd.read_parquet(partition_path(dataset_dir, key))
+
+
+def partitions_in_bbox(manifest, bbox):
+    """Returns the partition keys whose extent intersects a (minx, miny, maxx, maxy) bbox in EPSG:4326."""
+    minx, miny, maxx, maxy = bbox
+    return [
+        key for key, entry in manifest["partitions"].items()
+        if entry["bounds"][0] <= maxx and entry["bounds"][2] >= minx
+        and entry["bounds"][1] <= maxy and entry["bounds"][3] >= miny
+    ]
+
+
+def read_partitioned(dataset_dir, bbox=None):
+    """
+    Reads a partitioned dataset, or only the partitions intersecting a bbox (EPSG:4326).
+    """
+    manifest = read_manifest(dataset_dir)
+    keys = partitions_in_bbox(manifest, bbox) if bbox else list(manifest["partitions"])
+    frames = [read_partition(dataset_dir, key) for key in keys]
+    if not frames:
+        return gpd.GeoDataFrame(geometry=[], crs=manifest["crs"])
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+
+
+# Map-style operations: each takes and returns a GeoDataFrame for one partition.
+
+def area_ha(gdf, area_crs="EPSG:32717"):
+    """Adds an `area_ha` column of the polygon parts, measured in `area_crs`."""
+    gdf = gdf.copy()
+    gdf["area_ha"] = polygonal_area(gdf.geometry.to_numpy(), crs=gdf.crs, area_crs=area_crs) / 1e4
+    return gdf
+
+
+def filter_longitude(gdf, lon_threshold=-82):
+    """Keeps polygons with at least one vertex at or east of `lon_threshold` (see utils.filter_polygons)."""
+    bounds = lonlat_bounds(gdf)
+    polygonal = gdf.geometry.geom_type.isin(["Polygon", "MultiPolygon"]).to_numpy()
+    return gdf[polygonal & (bounds[:, 2] >= lon_threshold)]
+
+
+def reproject(gdf, crs="EPSG:32717"):
+    """Reprojects a partition."""
+    return gdf.to_crs(crs)
+
+
+def validate(gdf):
+    """Validates and repairs the geometries of a partition (single process inside the worker)."""
+    repaired, _ = validate_and_repair(gdf, workers=1)
+    return repaired
+
+
+MAP_OPERATIONS = {
+    "area": area_ha,
+    "filter": filter_longitude,
+    "reproject": reproject,
+    "validate": validate,
+}
+
+
+def _write_partition(output_dir, key, result, start_time):
+    """Writes one result partition and returns only its summary to the parent process."""
+    if len(result) == 0:
+        return key, 0, None, None, time.time() - start_time
+
+    folder = partition_path(output_dir, key)
+    os.makedirs(folder, exist_ok=True)
+    result.to_parquet(os.path.join(folder, "part-00000.parquet"), compression='snappy')
+    crs = result.crs.to_string() if result.crs is not None else None
+    return key, len(result), partition_extent(result), crs, time.time() - start_time
+
+
+def _run_map_task(task):
+    """Reads one partition, applies the function and writes the result."""
+    dataset_dir, output_dir, key, fn = task
+    start_time = time.time()
+    result = fn(read_partition(dataset_dir, key))
+    return _write_partition(output_dir, key, result, start_time)
+
+
+def _collect(manifest, output_dir, results, total):
+    """Consumes task results, updating the output manifest and printing progress."""
+    start_time = time.time()
+    rows = 0
+    for done, (key, n_rows, extent, crs, seconds) in enumerate(results, start=1):
+        rows += n_rows
+        if n_rows:
+            manifest["crs"] = crs or manifest["crs"]
+            _update_manifest(manifest, key, n_rows, extent)
+        print(f"[{done}/{total}] partition {key}: {n_rows} rows in {seconds:.1f} sec "
+              f"({rows} rows, {time.time() - start_time:.1f} sec total)")
+    write_manifest(output_dir, manifest)
+    return manifest
+
+
+def map_partitions(dataset_dir, fn, output_dir, workers=None):
+    """
+    Applies a function to every partition across a process pool.
+
+    Each worker reads one partition from disk, applies `fn` and writes the result, so memory
+    per worker is bounded by the largest partition. Results keep the same partition keys.
+
+    Parameters:
+        dataset_dir (str): Partitioned dataset created by partition_dataset.
+        fn (callable or str): Picklable function GeoDataFrame -> GeoDataFrame, or one of
+            "area", "filter", "reproject", "validate". Use functools.partial to pass arguments.
+        output_dir (str): Folder of the resulting partitioned dataset; partitions of a previous run are removed.
+        workers (int): Number of worker processes (defaults to os.cpu_count()).
+
+    Returns:
+        dict: The manifest of the output dataset.
+    """
+    fn = MAP_OPERATIONS[fn] if isinstance(fn, str) else fn
+    workers = workers or os.cpu_count()
+    clear_dataset(output_dir)
+
+    source = read_manifest(dataset_dir)
+    manifest = {"level": source["level"], "max_rows": source.get("max_rows"), "crs": source["crs"], "partitions": {}}
+    tasks = ((dataset_dir, output_dir, key, fn) for key in source["partitions"])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = bounded_map(executor, _run_map_task, tasks, max_pending=2 * workers)
+        return _collect(manifest, output_dir, results, len(source["partitions"]))
+
+
+def _run_join_task(task):
+    """Joins one left partition with the right partitions overlapping its extent."""
+    left_dir, right_dir, output_dir, key, right_keys, operation, kwargs = task
+    start_time = time.time()
+    left = read_partition(left_dir, key)
+    right_frames = [read_partition(right_dir, right_key) for right_key in right_keys]
+    right = gpd.GeoDataFrame(pd.concat(right_frames, ignore_index=True), crs=right_frames[0].crs)
+    if right.crs != left.crs:
+        right = right.to_crs(left.crs)
+
+    result = JOIN_OPERATIONS[operation](left, right, **kwargs)
+    return _write_partition(output_dir, key, result, start_time)
+
+
+def join_partitions(left_dir, right_dir, output_dir, operation="join", workers=None, **kwargs):
+    """
+    Partition-aware spatial join, overlay or clip between two partitioned datasets.
+
+    Each left partition is only compared with the right partitions whose extent (from the
+    manifests) intersects its own, so a worker holds one left partition plus its neighbours.
+    Every left feature lives in exactly one partition, so no pair is produced twice.
+
+    Parameters:
+        left_dir (str): Left partitioned dataset (e.g. parcels).
+        right_dir (str): Right partitioned dataset (e.g. cantons, rivers, or a clip mask).
+        output_dir (str): Folder of the resulting partitioned dataset (keyed like the left one);
+            partitions of a previous run are removed.
+        operation (str): "join", "overlay" or "clip" (see spatial_join).
+        workers (int): Number of worker processes (defaults to os.cpu_count()).
+        **kwargs: Extra arguments for the operation (e.g. predicate, area_crs).
+
+    Returns:
+        dict: The manifest of the output dataset.
+    """
+    if operation not in JOIN_OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+    workers = workers or os.cpu_count()
+    clear_dataset(output_dir)
+
+    left_manifest = read_manifest(left_dir)
+    right_manifest = read_manifest(right_dir)
+    manifest = {"level": left_manifest["level"], "max_rows": left_manifest.get("max_rows"),
+                "crs": left_manifest["crs"], "partitions": {}}
+
+    tasks = []
+    for key, entry in left_manifest["partitions"].items():
+        right_keys = partitions_in_bbox(right_manifest, entry["bounds"])
+        if right_keys:
+            tasks.append((left_dir, right_dir, output_dir, key, right_keys, operation, kwargs))
+    print(f"{len(tasks)} of {len(left_manifest['partitions'])} left partitions overlap the right dataset")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = bounded_map(executor, _run_join_task, tasks, max_pending=2 * workers)
+        return _collect(manifest, output_dir, results, len(tasks))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Partitioned out-of-core processing of large layers")
+    parser.add_argument("--workers", type=int, default=None)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    split = subparsers.add_parser("partition", help="Split a layer into quadtree GeoParquet partitions")
+    split.add_argument("input_file")
+    split.add_argument("output_dir")
+    split.add_argument("--level", type=int, default=6, help="Coarsest quadtree level")
+    split.add_argument("--max-rows", type=int, default=200000, help="Split cells above this many rows (0: fixed level)")
+    split.add_argument("--max-level", type=int, default=14, help="Finest quadtree level")
+    split.add_argument("--chunk-size", type=int, default=100000)
+
+    apply = subparsers.add_parser("map", help="Apply an operation to every partition")
+    apply.add_argument("operation", choices=sorted(MAP_OPERATIONS))
+    apply.add_argument("dataset_dir")
+    apply.add_argument("output_dir")
+    apply.add_argument("--crs", default="EPSG:32717", help="Target CRS (reproject) or area CRS (area)")
+    apply.add_argument("--lon-threshold", type=float, default=-82, help="Threshold for filter")
+
+    join = subparsers.add_parser("join", help="Partition-aware join/overlay/clip of two datasets")
+    join.add_argument("operation", choices=sorted(JOIN_OPERATIONS))
+    join.add_argument("left_dir")
+    join.add_argument("right_dir")
+    join.add_argument("output_dir")
+
+    args = parser.parse_args()
+    if args.command == "partition":
+        partition_dataset(args.input_file, args.output_dir, level=args.level, chunk_size=args.chunk_size,
+                          max_rows=args.max_rows or None, max_level=args.max_level)
+    elif args.command == "map":
+        fn = MAP_OPERATIONS[args.operation]
+        if args.operation == "area":
+            fn = partial(area_ha, area_crs=args.crs)
+        elif args.operation == "reproject":
+            fn = partial(reproject, crs=args.crs)
+        elif args.operation == "filter":
+            fn = partial(filter_longitude, lon_threshold=args.lon_threshold)
+        map_partitions(args.dataset_dir, fn, args.output_dir, workers=args.workers)
+    else:
+        join_partitions(args.left_dir, args.right_dir, args.output_dir, operation=args.operation, workers=args.workers)
+
+### python partitioned.py partition catastro_ecuador.parquet catastro_parts --max-rows 100000
+### python partitioned.py map area catastro_parts catastro_area
+### python partitioned.py join overlay catastro_parts cantones_parts catastro_cantones
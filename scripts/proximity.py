@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from pyproj import Transformer
+from shapely.strtree import STRtree
+
+from spatial_join import read_layer
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def _as_geoseries(layer):
+    """Accepts a GeoDataFrame, a GeoSeries or a file path and returns a GeoSeries."""
+    if isinstance(layer, str):
+        layer = read_layer(layer)
+    if isinstance(layer, gpd.GeoDataFrame):
+        layer = layer.geometry
+    if layer.crs is None:
+        layer = layer.set_crs("EPSG:4326")
+    return layer
+
+
+def to_metric(layer, metric_crs="EPSG:32717"):
+    """
+    Projects a layer once to a metric CRS (UTM 17S by default, as in calculate_area_hectares)
+    and returns the geometries as a NumPy array.
+    """
+    return _as_geoseries(layer).to_crs(metric_crs).to_numpy()
+
+
+def to_lonlat(layer, metric_crs="EPSG:32717"):
+    """
+    Returns (lon, lat) arrays for a layer; non-point geometries are reduced to their
+    centroid, computed in the metric CRS.
+    """
+    geoms = _as_geoseries(layer)
+    if not (geoms.geom_type == "Point").all():
+        geoms = geoms.to_crs(metric_crs).centroid
+    geoms = geoms.to_crs("EPSG:4326")
+    return geoms.x.to_numpy(), geoms.y.to_numpy()
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Great-circle distance in meters between lon/lat arrays (NumPy broadcasting rules apply).
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(lon1, lat1, lon2, lat2):
+    """
+    Great-circle distances in meters between every point of set 1 (rows) and set 2 (columns).
+    """
+    return haversine(lon1[:, None], lat1[:, None], lon2[None, :], lat2[None, :])
+
+
+def iter_distance_matrix(source, target, metric_crs="EPSG:32717", geodesic=False, chunk_size=1000):
+    """
+    Computes the source × target distance matrix in row blocks.
+
+    Parameters:
+        source, target (GeoDataFrame, GeoSeries or str): Layers or paths to them.
+        metric_crs (str): Metric CRS used for planar distances.
+        geodesic (bool): If True, uses haversine distances between the nearest points of
+            each pair (see pair_distances), as nearest and within_distance do.
+        chunk_size (int): Number of source rows per block.
+
+    Yields:
+        tuple: (row_start, block) where block is a float64 array of shape (rows, len(target)) in meters.
+    """
+    src = to_metric(source, metric_crs)
+    tgt = to_metric(target, metric_crs)
+    for start in range(0, len(src), chunk_size):
+        rows = np.arange(start, min(start + chunk_size, len(src)))
+        if not geodesic:
+            yield start, shapely.distance(src[rows, None], tgt[None, :])
+            continue
+
+        source_idx = np.repeat(rows, len(tgt))
+        target_idx = np.tile(np.arange(len(tgt)), len(rows))
+        distances = pair_distances(src, tgt, source_idx, target_idx, metric_crs, geodesic=True)
+        yield start, distances.reshape(len(rows), len(tgt))
+
+
+def distance_matrix(source, target, metric_crs="EPSG:32717", geodesic=False, chunk_size=1000, output_file=None):
+    """
+    Full source × target distance matrix in meters.
+
+    If `output_file` is given, the matrix is written block by block to a `.npy` memory-mapped
+    file so N×M cases larger than RAM can be computed; the memmap is returned.
+    """
+    source, target = _as_geoseries(source), _as_geoseries(target)
+    n_source, n_target = len(source), len(target)
+
+    if output_file:
+        matrix = np.lib.format.open_memmap(output_file, mode='w+', dtype=np.float64, shape=(n_source, n_target))
+    else:
+        matrix = np.empty((n_source, n_target), dtype=np.float64)
+
+    for start, block in iter_distance_matrix(source, target, metric_crs, geodesic, chunk_size):
+        matrix[start:start + len(block)] = block
+
+    if output_file:
+        matrix.flush()
+    return matrix
+
+
+def pair_distances(src, tgt, source_idx, target_idx, metric_crs="EPSG:32717", geodesic=False):
+    """
+    Exact distances in meters between paired projected geometries src[source_idx] and tgt[target_idx].
+
+    Planar distances are measured in the metric CRS. With geodesic=True the shortest line between
+    each pair is found in the metric CRS and its two end points (the nearest points of both
+    geometries) are measured with haversine, so lines and polygons are not reduced to centroids.
+    """
+    if not geodesic:
+        return shapely.distance(src[source_idx], tgt[target_idx])
+    if len(source_idx) == 0:
+        return np.empty(0, dtype=np.float64)
+
+    lines = shapely.shortest_line(src[source_idx], tgt[target_idx])
+    coords = shapely.get_coordinates(lines)
+    lon, lat = Transformer.from_crs(metric_crs, "EPSG:4326", always_xy=True).transform(coords[:, 0], coords[:, 1])
+    return haversine(lon[0::2], lat[0::2], lon[1::2], lat[1::2])
+
+
+def nearest(source, target, k=1, max_distance=None, metric_crs="EPSG:32717", geodesic=False, chunk_size=1000):
+    """
+    Finds the k nearest target features for each source feature.
+
+    With k=1 and planar distances the query runs on an STRtree built once on the projected
+    target layer. Otherwise each source feature starts from a search radius just beyond its
+    nearest target and queries the same STRtree with "dwithin", doubling the radius until at
+    least k candidates fall inside it; exact distances are only computed on those candidates.
+    Geodesic distances are measured between the nearest points of both geometries, and the
+    planar search radius is widened by 10% to cover the scale difference of the metric CRS.
+
+    Parameters:
+        source (GeoDataFrame, GeoSeries or str): Features to search from (e.g. neighbourhood centroids).
+        target (GeoDataFrame, GeoSeries or str): Candidate features (e.g. malls).
+        k (int): Number of neighbours per source feature.
+        max_distance (float): Optional search radius in meters.
+        metric_crs (str): Metric CRS used for planar distances.
+        geodesic (bool): If True, uses haversine distances between the nearest points.
+        chunk_size (int): Number of source rows queried at once.
+
+    Returns:
+        DataFrame: Columns source_idx, target_idx, rank and distance_m (positional indices).
+    """
+    source, target = _as_geoseries(source), _as_geoseries(target)
+    src = to_metric(source, metric_crs)
+    tgt = to_metric(target, metric_crs)
+    tree = STRtree(tgt)
+
+    if k == 1 and not geodesic:
+        (source_idx, target_idx), distances = tree.query_nearest(
+            src, max_distance=max_distance, return_distance=True, all_matches=False
+        )
+        return pd.DataFrame({
+            "source_idx": source_idx,
+            "target_idx": target_idx,
+            "rank": np.ones(len(source_idx), dtype=np.int64),
+            "distance_m": distances,
+        })
+
+    columns = ["source_idx", "target_idx", "rank", "distance_m"]
+    kk = min(k, int((~shapely.is_missing(tgt) & ~shapely.is_empty(tgt)).sum()))
+    if kk == 0:
+        return pd.DataFrame(columns=columns)
+
+    scale = 1.1 if geodesic else 1.0
+    limit = np.inf if max_distance is None else max_distance * scale
+
+    # Expected distance to the k-th neighbour if the targets were spread evenly over their extent.
+    minx, miny, maxx, maxy = shapely.total_bounds(tgt)
+    spacing = max(np.sqrt((maxx - minx) * (maxy - miny) * kk / len(tgt)), 1.0)
+
+    frames = []
+    for start in range(0, len(src), chunk_size):
+        rows = np.arange(start, min(start + chunk_size, len(src)))
+        (first_source, _), first_dist = tree.query_nearest(src[rows], return_distance=True, all_matches=False)
+        rows = rows[first_source]
+        radius = np.minimum(first_dist * scale + spacing, limit)
+
+        while len(rows):
+            hits, target_idx = tree.query(src[rows], predicate="dwithin", distance=radius)
+            source_idx = rows[hits]
+            distances = pair_distances(src, tgt, source_idx, target_idx, metric_crs, geodesic)
+
+            # Every target closer than radius / scale is a candidate, so a source is resolved once
+            # k of its candidates are inside that range (or the radius reached max_distance).
+            inside = distances <= radius[hits] / scale
+            n_inside = np.bincount(hits, weights=inside, minlength=len(rows))
+            resolved = (n_inside >= kk) | (radius >= limit)
+
+            keep = resolved[hits]
+            if max_distance is not None:
+                keep &= distances <= max_distance
+            frame = pd.DataFrame({
+                "source_idx": source_idx[keep],
+                "target_idx": target_idx[keep],
+                "distance_m": distances[keep],
+            }).sort_values(["source_idx", "distance_m"], kind="stable")
+            frame["rank"] = frame.groupby("source_idx").cumcount() + 1
+            frames.append(frame[frame["rank"] <= kk][columns])
+
+            rows, radius = rows[~resolved], np.minimum(radius[~resolved] * 2, limit)
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    result = pd.concat(frames, ignore_index=True).sort_values(["source_idx", "rank"], ignore_index=True)
+    result["rank"] = result["rank"].astype(np.int64)
+    return result
+
+
+def within_distance(source, target, distance, metric_crs="EPSG:32717", geodesic=False):
+    """
+    Finds all (source, target) pairs closer than `distance` meters,
+    e.g. all parcels within 2 km of a river.
+
+    Candidates come from a single STRtree "dwithin" query on the projected layers. With
+    geodesic=True the search radius is widened by 10% and the pairs are then filtered with
+    haversine distances between the nearest points of each pair (see pair_distances).
+
+    Returns:
+        DataFrame: Columns source_idx, target_idx and distance_m (positional indices).
+    """
+    source, target = _as_geoseries(source), _as_geoseries(target)
+    src = to_metric(source, metric_crs)
+    tgt = to_metric(target, metric_crs)
+    radius = distance * 1.1 if geodesic else distance
+
+    source_idx, target_idx = STRtree(tgt).query(src, predicate="dwithin", distance=radius)
+    distances = pair_distances(src, tgt, source_idx, target_idx, metric_crs, geodesic)
+
+    keep = distances <= distance
+    return pd.DataFrame({
+        "source_idx": source_idx[keep],
+        "target_idx": target_idx[keep],
+        "distance_m": distances[keep],
+    })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Nearest-neighbour and within-distance queries between two layers")
+    parser.add_argument("source_file", help="Source layer (KML/KMZ, GeoJSON or GeoParquet)")
+    parser.add_argument("target_file", help="Target layer (KML/KMZ, GeoJSON or GeoParquet)")
+    parser.add_argument("output_csv", help="Where to save the resulting pairs")
+    parser.add_argument("--k", type=int, default=1, help="Number of nearest neighbours")
+    parser.add_argument("--within", type=float, default=None, help="Return all pairs within this distance (m)")
+    parser.add_argument("--geodesic", action="store_true", help="Use haversine distances")
+    parser.add_argument("--metric-crs", default="EPSG:32717")
+
+    args = parser.parse_args()
+    if args.within is not None:
+        result = within_distance(args.source_file, args.target_file, args.within, args.metric_crs, args.geodesic)
+    else:
+        result = nearest(args.source_file, args.target_file, k=args.k, metric_crs=args.metric_crs, geodesic=args.geodesic)
+    result.to_csv(args.output_csv, index=False)
+    print(f"Saved {len(result)} pairs to {args.output_csv}")
+
+### python proximity.py barrios.kml "Centros Comerciales.kml" nearest_mall.csv --k 3
+### python proximity.py parcels.parquet rivers.geojson parcels_near_rivers.csv --within 2000
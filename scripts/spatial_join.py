@@ -0,0 +1,376 @@
+import os
+import json
+import pyproj
+import shapely
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from shapely.strtree import STRtree
+
+from folium_sample import read_kml
+from geometry_validation import polygonal_only
+
+# Predicate to use when the tree is built on the left layer and queried with the right one,
+# so that results always mean "predicate(left_geom, right_geom)" as in geopandas.sjoin.
+INVERSE_PREDICATES = {
+    "intersects": "intersects",
+    "within": "contains",
+    "contains": "within",
+    "covers": "covered_by",
+    "covered_by": "covers",
+    "touches": "touches",
+    "crosses": "crosses",
+    "overlaps": "overlaps",
+}
+
+# Broadcast layer held by each worker process (set once by _init_worker).
+_BROADCAST = None
+
+
+def read_layer(file_path):
+    """
+    Reads a KML/KMZ, GeoParquet or any other OGR-readable file into a GeoDataFrame.
+    """
+    if file_path.endswith(('.kml', '.kmz')):
+        gdf, _ = read_kml(file_path)
+        return gdf.set_crs("EPSG:4326") if gdf.crs is None else gdf
+    if file_path.endswith('.parquet'):
+        return gpd.read_parquet(file_path)
+    return gpd.read_file(file_path)
+
+
+def layer_size(layer):
+    """
+    Returns the number of features of a GeoDataFrame, or of a GeoParquet file from its metadata.
+    """
+    if isinstance(layer, str):
+        if not layer.endswith('.parquet'):
+            raise ValueError(f"Only GeoParquet files can be sized without loading them: {layer}")
+        return pq.ParquetFile(layer).metadata.num_rows
+    return len(layer)
+
+
+def load_unless_parquet(layer):
+    """
+    Reads a layer path into a GeoDataFrame, except GeoParquet paths which are kept to be streamed.
+    """
+    if isinstance(layer, str) and not layer.endswith('.parquet'):
+        return read_layer(layer)
+    return layer
+
+
+def clear_parts(output_dir):
+    """
+    Creates output_dir if needed and removes `part-*.parquet` files left by a previous run,
+    so that reading the folder back never mixes old and new results.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name in os.listdir(output_dir):
+        if name.startswith("part-") and name.endswith(".parquet"):
+            os.remove(os.path.join(output_dir, name))
+
+
+def _parquet_geo_metadata(parquet_file):
+    """Returns (geometry column, CRS) from the GeoParquet "geo" metadata of a pq.ParquetFile."""
+    geo = json.loads(parquet_file.schema_arrow.metadata[b"geo"])
+    geometry_column = geo["primary_column"]
+    crs = geo["columns"][geometry_column].get("crs", "EPSG:4326")
+    crs = pyproj.CRS.from_json_dict(crs) if isinstance(crs, dict) else crs
+    return geometry_column, crs
+
+
+def layer_crs(layer):
+    """
+    Returns the CRS of a GeoDataFrame, or of a GeoParquet file from its metadata.
+    """
+    if isinstance(layer, str):
+        return _parquet_geo_metadata(pq.ParquetFile(layer))[1]
+    return layer.crs
+
+
+def iter_parquet_chunks(file_path, chunk_size=50000, columns=None):
+    """
+    Streams a GeoParquet file as GeoDataFrames of at most `chunk_size` rows.
+
+    Parameters:
+        file_path (str): Path to the GeoParquet file.
+        chunk_size (int): Maximum number of rows per chunk.
+        columns (list): Optional subset of attribute columns to read.
+
+    Yields:
+        GeoDataFrame: One chunk at a time, with the CRS stored in the file metadata.
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    geometry_column, crs = _parquet_geo_metadata(parquet_file)
+
+    if columns is not None and geometry_column not in columns:
+        columns = list(columns) + [geometry_column]
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        df = pa.Table.from_batches([batch]).to_pandas()
+        geometry = gpd.GeoSeries.from_wkb(df.pop(geometry_column), crs=crs)
+        yield gpd.GeoDataFrame(df, geometry=geometry.values, crs=crs)
+
+
+def iter_chunks(layer, chunk_size=50000):
+    """
+    Splits a GeoDataFrame, a GeoParquet path or any readable file into GeoDataFrame chunks.
+    """
+    if isinstance(layer, str) and layer.endswith('.parquet'):
+        yield from iter_parquet_chunks(layer, chunk_size)
+        return
+    if isinstance(layer, str):
+        layer = read_layer(layer)
+    for start in range(0, len(layer), chunk_size):
+        yield layer.iloc[start:start + chunk_size]
+
+
+def bounded_map(executor, fn, iterable, max_pending):
+    """
+    Like executor.map, but keeps at most `max_pending` tasks in flight so inputs
+    are consumed lazily and memory stays bounded. Results are yielded in completion order.
+    """
+    pending = set()
+    for item in iterable:
+        pending.add(executor.submit(fn, item))
+        while len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def query_pairs(left_geoms, right_geoms, predicate="intersects"):
+    """
+    Returns index arrays (left_idx, right_idx) of pairs satisfying predicate(left, right).
+
+    The STRtree is built on the larger of the two inputs and queried with the smaller one.
+    """
+    if predicate not in INVERSE_PREDICATES:
+        raise ValueError(f"Unsupported predicate: {predicate}")
+
+    if len(right_geoms) >= len(left_geoms):
+        left_idx, right_idx = STRtree(right_geoms).query(left_geoms, predicate=predicate)
+    else:
+        right_idx, left_idx = STRtree(left_geoms).query(right_geoms, predicate=INVERSE_PREDICATES[predicate])
+
+    order = np.lexsort((right_idx, left_idx))
+    return left_idx[order], right_idx[order]
+
+
+def _merge_attributes(left, right, left_idx, right_idx, geometry, lsuffix="left", rsuffix="right"):
+    """Builds a GeoDataFrame with the attributes of both layers for each matched pair."""
+    left_attrs = pd.DataFrame(left.drop(columns=left.geometry.name)).iloc[left_idx].reset_index(drop=True)
+    right_attrs = pd.DataFrame(right.drop(columns=right.geometry.name)).iloc[right_idx].reset_index(drop=True)
+
+    overlap = left_attrs.columns.intersection(right_attrs.columns)
+    left_attrs = left_attrs.rename(columns={c: f"{c}_{lsuffix}" for c in overlap})
+    right_attrs = right_attrs.rename(columns={c: f"{c}_{rsuffix}" for c in overlap})
+
+    df = pd.concat([left_attrs, right_attrs], axis=1)
+    return gpd.GeoDataFrame(df, geometry=geometry, crs=left.crs)
+
+
+def join_chunk(left, right, predicate="intersects"):
+    """
+    Spatial join of two GeoDataFrames keeping the left geometry (inner join).
+    """
+    left_idx, right_idx = query_pairs(left.geometry.to_numpy(), right.geometry.to_numpy(), predicate)
+    geometry = left.geometry.to_numpy()[left_idx]
+    return _merge_attributes(left, right, left_idx, right_idx, geometry)
+
+
+def overlay_chunk(left, right, area_crs="EPSG:32717"):
+    """
+    Intersection overlay of two GeoDataFrames with the overlap area in hectares.
+
+    Adds `area_ha` (area of each intersection piece) and `overlap_ratio`
+    (intersection area over the area of the left feature), both computed in `area_crs`.
+    When both features of a pair are polygons, only the polygon parts of the intersection
+    are kept, so neighbours that merely share an edge or a corner produce no row.
+    """
+    left_geoms, right_geoms = left.geometry.to_numpy(), right.geometry.to_numpy()
+    left_idx, right_idx = query_pairs(left_geoms, right_geoms, "intersects")
+    pieces = shapely.intersection(left_geoms[left_idx], right_geoms[right_idx])
+
+    polygonal = (np.isin(shapely.get_type_id(left_geoms[left_idx]), (3, 6))
+                 & np.isin(shapely.get_type_id(right_geoms[right_idx]), (3, 6)))
+    if polygonal.any():
+        pieces[polygonal] = polygonal_only(pieces[polygonal])
+
+    keep = ~shapely.is_empty(pieces) & ~(polygonal & (shapely.area(pieces) == 0))
+    left_idx, right_idx, pieces = left_idx[keep], right_idx[keep], pieces[keep]
+
+    result = _merge_attributes(left, right, left_idx, right_idx, pieces)
+    piece_area = result.geometry.to_crs(area_crs).area.values
+    left_area = left.geometry.iloc[left_idx].to_crs(area_crs).area.values
+
+    result["area_ha"] = piece_area / 1e4
+    result["overlap_ratio"] = np.divide(piece_area, left_area, out=np.zeros_like(piece_area), where=left_area > 0)
+    return result
+
+
+def clip_chunk(left, mask):
+    """
+    Clips the features of `left` to the union of the `mask` features they intersect.
+    """
+    left_idx, mask_idx = query_pairs(left.geometry.to_numpy(), mask.geometry.to_numpy(), "intersects")
+    pieces = shapely.intersection(left.geometry.to_numpy()[left_idx], mask.geometry.to_numpy()[mask_idx])
+
+    keep = ~shapely.is_empty(pieces)
+    left_idx, pieces = left_idx[keep], pieces[keep]
+    if len(left_idx) == 0:
+        return left.iloc[:0]
+
+    # Pairs are sorted by left index, so each feature's pieces are contiguous.
+    unique_idx, starts = np.unique(left_idx, return_index=True)
+    clipped = [shapely.union_all(part) for part in np.split(pieces, starts[1:])]
+
+    result = left.iloc[unique_idx].copy()
+    result[left.geometry.name] = clipped
+    return result
+
+
+OPERATIONS = {
+    "join": join_chunk,
+    "overlay": overlay_chunk,
+    "clip": clip_chunk,
+}
+
+
+def _init_worker(broadcast):
+    """Stores the broadcast layer once per worker process."""
+    global _BROADCAST
+    _BROADCAST = broadcast
+
+
+def _process_chunk(task):
+    """Runs one operation on a streamed chunk and writes the result as a GeoParquet part."""
+    index, chunk, operation, streamed_is_left, output_dir, kwargs = task
+
+    # The right layer is always brought to the left CRS, so the output CRS is the left one.
+    broadcast = _BROADCAST
+    if not streamed_is_left and chunk.crs != broadcast.crs:
+        chunk = chunk.to_crs(broadcast.crs)
+
+    left, right = (chunk, broadcast) if streamed_is_left else (broadcast, chunk)
+    result = OPERATIONS[operation](left, right, **kwargs)
+
+    if len(result) == 0:
+        return index, 0, None
+
+    part_path = os.path.join(output_dir, f"part-{index:05d}.parquet")
+    result.to_parquet(part_path, compression='snappy')
+    return index, len(result), part_path
+
+
+def run_partitioned(operation, left, right, output_dir, chunk_size=50000, workers=None, **kwargs):
+    """
+    Runs a join, overlay or clip between two layers in chunks across a process pool.
+
+    The larger layer is streamed in chunks of `chunk_size` rows while the smaller one is
+    sent once to every worker; inside each task the STRtree is built on the larger side.
+    Each chunk result is written as `part-NNNNN.parquet` under `output_dir` (parts from a
+    previous run are removed first), so memory stays bounded and the output can be read back
+    with `gpd.read_parquet(output_dir)`.
+
+    Parameters:
+        operation (str): One of "join", "overlay" or "clip".
+        left (GeoDataFrame or str): Left layer or path to it (KML/KMZ, GeoParquet, GeoJSON...).
+        right (GeoDataFrame or str): Right layer (or mask for "clip") or path to it.
+        output_dir (str): Folder where the GeoParquet parts are written.
+        chunk_size (int): Number of rows of the streamed layer per task.
+        workers (int): Number of worker processes (defaults to os.cpu_count()).
+        **kwargs: Extra arguments for the operation (e.g. predicate, area_crs).
+
+    Returns:
+        list: Paths of the written GeoParquet parts.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+    if operation == "clip" and kwargs:
+        raise ValueError("clip does not take extra arguments")
+
+    clear_parts(output_dir)
+    workers = workers or os.cpu_count()
+
+    # Non-Parquet layers are read once here; GeoParquet layers are sized from their metadata
+    # and, if they end up as the streamed side, read row group by row group.
+    left, right = load_unless_parquet(left), load_unless_parquet(right)
+
+    # Clip output keeps only the left layer, so the mask is always the broadcast side.
+    streamed_is_left = operation == "clip" or layer_size(left) >= layer_size(right)
+    streamed, broadcast = (left, right) if streamed_is_left else (right, left)
+    if isinstance(broadcast, str):
+        broadcast = read_layer(broadcast)
+    if streamed_is_left:
+        left_crs = layer_crs(left)
+        if left_crs is not None and broadcast.crs != left_crs:
+            broadcast = broadcast.to_crs(left_crs)
+
+    tasks = (
+        (i, chunk, operation, streamed_is_left, output_dir, kwargs)
+        for i, chunk in enumerate(iter_chunks(streamed, chunk_size))
+    )
+
+    parts = []
+    total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(broadcast,)) as executor:
+        for index, n_rows, part_path in bounded_map(executor, _process_chunk, tasks, max_pending=2 * workers):
+            total_rows += n_rows
+            if part_path:
+                parts.append(part_path)
+            print(f"Chunk {index}: {n_rows} rows ({total_rows} total)")
+
+    print(f"{operation.capitalize()} finished: {total_rows} rows in {len(parts)} parts at {output_dir}")
+    return sorted(parts)
+
+
+def spatial_join(left, right, output_dir, predicate="intersects", chunk_size=50000, workers=None):
+    """
+    Chunked, parallel inner spatial join written to GeoParquet parts (left geometry kept).
+    """
+    return run_partitioned("join", left, right, output_dir, chunk_size, workers, predicate=predicate)
+
+
+def overlay_intersection(left, right, output_dir, area_crs="EPSG:32717", chunk_size=50000, workers=None):
+    """
+    Chunked, parallel intersection overlay with `area_ha` and `overlap_ratio` columns.
+    """
+    return run_partitioned("overlay", left, right, output_dir, chunk_size, workers, area_crs=area_crs)
+
+
+def clip_layer(layer, mask, output_dir, chunk_size=50000, workers=None):
+    """
+    Chunked, parallel clipping of a layer to a mask layer.
+    """
+    return run_partitioned("clip", layer, mask, output_dir, chunk_size, workers)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chunked spatial join / overlay / clip to GeoParquet")
+    parser.add_argument("operation", choices=sorted(OPERATIONS))
+    parser.add_argument("left_file", help="Left layer (KML/KMZ, GeoJSON or GeoParquet)")
+    parser.add_argument("right_file", help="Right layer, or mask for clip")
+    parser.add_argument("output_dir", help="Folder for the GeoParquet parts")
+    parser.add_argument("--predicate", default="intersects", choices=sorted(INVERSE_PREDICATES))
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=None)
+
+    args = parser.parse_args()
+    kwargs = {"predicate": args.predicate} if args.operation == "join" else {}
+    run_partitioned(args.operation, args.left_file, args.right_file, args.output_dir,
+                    chunk_size=args.chunk_size, workers=args.workers, **kwargs)
+
+### python spatial_join.py join parcels.parquet barrios.kml out/parcels_barrios
+### python spatial_join.py overlay parcels.parquet cantones.geojson out/parcels_cantones --workers 8
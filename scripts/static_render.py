@@ -0,0 +1,328 @@
+import os
+import math
+import time
+import shapely
+import threading
+import urllib.request
+
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+
+from concurrent.futures import ProcessPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+from spatial_join import bounded_map
+
+ESRI_WORLD_IMAGERY = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
+OSM_TILES = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+WEB_MERCATOR_HALF = 20037508.342789244
+TILE_SIZE = 256
+
+# Per-worker state (set once by _init_worker).
+_CACHE = None
+_FIGURE = None
+_SETTINGS = None
+
+
+class TileCache:
+    """
+    Disk-backed XYZ tile cache with least-recently-used eviction.
+
+    Tiles are stored as `{cache_dir}/{z}/{x}/{y}.tile`; the file modification time is
+    refreshed on every hit and used as the LRU clock, so the cache can be shared by
+    several worker processes and survives between runs. When the total size goes above
+    `max_bytes`, the least recently used tiles are deleted.
+    """
+
+    def __init__(self, cache_dir, url_template=ESRI_WORLD_IMAGERY, max_bytes=2 * 1024 ** 3, timeout=10):
+        self.cache_dir = cache_dir
+        self.url_template = url_template
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._entries())
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """Yields (path, mtime, size) for every cached tile."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tile"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def tile_path(self, z, x, y):
+        return os.path.join(self.cache_dir, str(z), str(x), f"{y}.tile")
+
+    def get(self, z, x, y):
+        """
+        Returns the path of a cached tile, downloading it on a miss.
+        """
+        path = self.tile_path(z, x, y)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # Evicted by another worker in the meantime
+            else:
+                self.hits += 1
+                return path
+
+        self.misses += 1
+        url = self.url_template.format(z=z, x=x, y=y)
+        request = urllib.request.Request(url, headers={"User-Agent": "GeographicalAnalysis/static_render"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = response.read()
+
+        # Write to a temporary file first so other workers never read a partial tile.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """
+        Deletes least recently used tiles until the cache is at 90% of max_bytes.
+        The tile at `keep` (the one just downloaded) is never deleted.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = 0.9 * self.max_bytes
+        for path, _, size in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total_bytes = total
+
+
+class _QuietRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler that does not log every tile request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_tile_server(tile_dir, port=0):
+    """
+    Serves `{tile_dir}/{z}/{x}/{y}.png` over HTTP in a background thread, as an offline
+    stand-in for ESRI/OSM when filling the cache in tests or air-gapped machines.
+
+    Returns:
+        tuple: (server, url_template). Call server.shutdown() when done.
+    """
+    handler = partial(_QuietRequestHandler, directory=tile_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/{{z}}/{{x}}/{{y}}.png"
+
+
+def zoom_for_bounds(bounds, size_px, max_zoom=19):
+    """
+    Highest zoom level at which a Web Mercator bbox fits in `size_px` pixels.
+    """
+    minx, miny, maxx, maxy = bounds
+    extent = max(maxx - minx, maxy - miny, 1.0)
+    zoom = math.floor(math.log2(2 * WEB_MERCATOR_HALF * size_px / (TILE_SIZE * extent)))
+    return max(0, min(max_zoom, zoom))
+
+
+def tile_range(bounds, zoom):
+    """Returns (x0, x1, y0, y1) tile indices (inclusive) covering a Web Mercator bbox."""
+    minx, miny, maxx, maxy = bounds
+    n = 2 ** zoom
+    scale = n / (2 * WEB_MERCATOR_HALF)
+    tiles = np.array([
+        (minx + WEB_MERCATOR_HALF) * scale,
+        (maxx + WEB_MERCATOR_HALF) * scale,
+        (WEB_MERCATOR_HALF - maxy) * scale,
+        (WEB_MERCATOR_HALF - miny) * scale,
+    ])
+    x0, x1, y0, y1 = np.clip(tiles.astype(int), 0, n - 1).tolist()
+    return x0, x1, y0, y1
+
+
+def basemap_mosaic(cache, bounds, zoom):
+    """
+    Stitches the cached tiles covering a bbox into one RGB image.
+
+    Returns:
+        tuple: (image array, (left, right, bottom, top) extent in Web Mercator).
+    """
+    x0, x1, y0, y1 = tile_range(bounds, zoom)
+    mosaic = np.full(((y1 - y0 + 1) * TILE_SIZE, (x1 - x0 + 1) * TILE_SIZE, 3), 0.85)
+
+    for ty in range(y0, y1 + 1):
+        for tx in range(x0, x1 + 1):
+            try:
+                tile = mpimg.imread(cache.get(zoom, tx, ty))
+            except Exception as e:
+                print(f"Tile {zoom}/{tx}/{ty} unavailable: {e}")
+                continue
+            tile = tile[..., :3].astype(np.float64)
+            if tile.max() > 1:
+                tile /= 255.0
+            row, col = (ty - y0) * TILE_SIZE, (tx - x0) * TILE_SIZE
+            mosaic[row:row + TILE_SIZE, col:col + TILE_SIZE] = tile[:TILE_SIZE, :TILE_SIZE]
+
+    tile_span = 2 * WEB_MERCATOR_HALF / 2 ** zoom
+    extent = (
+        -WEB_MERCATOR_HALF + x0 * tile_span,
+        -WEB_MERCATOR_HALF + (x1 + 1) * tile_span,
+        WEB_MERCATOR_HALF - (y1 + 1) * tile_span,
+        WEB_MERCATOR_HALF - y0 * tile_span,
+    )
+    return mosaic, extent
+
+
+def _init_worker(cache_dir, url_template, max_bytes, size_px, dpi, padding, edgecolor, facecolor):
+    """Creates the tile cache and one reusable Agg figure per worker process."""
+    global _CACHE, _FIGURE, _SETTINGS
+    _CACHE = TileCache(cache_dir, url_template, max_bytes)
+    _FIGURE = plt.figure(figsize=(size_px / dpi, size_px / dpi), dpi=dpi)
+    _FIGURE.add_axes([0, 0, 1, 1])
+    _SETTINGS = dict(size_px=size_px, dpi=dpi, padding=padding, edgecolor=edgecolor, facecolor=facecolor)
+
+
+def render_parcel(geometry, output_file):
+    """
+    Renders one Web Mercator geometry over its basemap to a PNG using the worker's figure.
+    """
+    settings = _SETTINGS
+    ax = _FIGURE.axes[0]
+    ax.clear()
+    ax.set_axis_off()
+
+    minx, miny, maxx, maxy = geometry.bounds
+    pad = max(maxx - minx, maxy - miny, 10.0) * settings["padding"]
+    cx, cy = (minx + maxx) / 2, (miny + maxy) / 2
+    half = max(maxx - minx, maxy - miny) / 2 + pad
+    view = (cx - half, cy - half, cx + half, cy + half)
+
+    zoom = zoom_for_bounds(view, settings["size_px"])
+    mosaic, extent = basemap_mosaic(_CACHE, view, zoom)
+    ax.imshow(mosaic, extent=extent, interpolation="bilinear")
+
+    for polygon in getattr(geometry, "geoms", [geometry]):
+        if polygon.geom_type != "Polygon":
+            continue
+        x, y = polygon.exterior.xy
+        ax.fill(x, y, facecolor=settings["facecolor"], edgecolor=settings["edgecolor"], linewidth=2)
+
+    ax.set_xlim(view[0], view[2])
+    ax.set_ylim(view[1], view[3])
+    _FIGURE.savefig(output_file, dpi=settings["dpi"])
+
+
+def _render_batch(batch):
+    """Renders a batch of (wkb, output_file) pairs and returns how many were written."""
+    rendered = 0
+    for wkb, output_file in batch:
+        try:
+            render_parcel(shapely.from_wkb(wkb), output_file)
+            rendered += 1
+        except Exception as e:
+            print(f"Could not render {output_file}: {e}")
+    return rendered, len(batch), _CACHE.hits, _CACHE.misses
+
+
+def render_thumbnails(gdf, output_folder, cache_dir="tile_cache", name_column="Name",
+                      url_template=ESRI_WORLD_IMAGERY, size_px=512, dpi=100, padding=0.15,
+                      edgecolor="red", facecolor=(1, 0, 0, 0.25), batch_size=64, workers=None,
+                      max_cache_bytes=2 * 1024 ** 3):
+    """
+    Renders one static PNG thumbnail per parcel across a process pool.
+
+    Each worker keeps one matplotlib Agg figure alive as a persistent headless renderer and
+    reads basemap tiles through a shared on-disk TileCache, so repeated runs do not hit the
+    tile server again. Parcels are sent to the workers in batches of `batch_size`.
+
+    Parameters:
+        gdf (GeoDataFrame): Parcels to render.
+        output_folder (str): Folder to save the PNG files.
+        cache_dir (str): Folder of the tile cache.
+        name_column (str): Column used for file names (falls back to Polygon_<i>).
+        url_template (str): XYZ tile URL with {z}, {x} and {y} placeholders.
+        size_px (int): Width and height of each image in pixels.
+        dpi (int): Resolution used by matplotlib.
+        padding (float): Margin around each parcel, as a fraction of its size.
+        batch_size (int): Parcels per task.
+        workers (int): Number of worker processes (defaults to os.cpu_count()).
+        max_cache_bytes (int): Size limit of the tile cache.
+
+    Returns:
+        int: Number of PNG files written.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    workers = workers or os.cpu_count()
+
+    geometry = gdf.geometry if gdf.crs is not None else gdf.geometry.set_crs("EPSG:4326")
+    geometry = shapely.force_2d(geometry.to_crs("EPSG:3857").to_numpy())
+    names = gdf[name_column].astype(str).tolist() if name_column in gdf.columns \
+        else [f"Polygon_{i}" for i in range(len(gdf))]
+    items = [
+        (shapely.to_wkb(geom), os.path.join(output_folder, f"{name}.png"))
+        for geom, name in zip(geometry, names)
+    ]
+    batches = (items[start:start + batch_size] for start in range(0, len(items), batch_size))
+
+    initargs = (cache_dir, url_template, max_cache_bytes, size_px, dpi, padding, edgecolor, facecolor)
+    start_time = time.time()
+    written = processed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+        for rendered, n_items, hits, misses in bounded_map(executor, _render_batch, batches, max_pending=2 * workers):
+            written += rendered
+            processed += n_items
+            elapsed = time.time() - start_time
+            print(f"Rendered {processed}/{len(items)} parcels ({processed / elapsed:.1f} img/s, "
+                  f"worker tile cache hits/misses: {hits}/{misses})")
+
+    print(f"Saved {written} thumbnails to {output_folder} in {time.time() - start_time:.1f} sec")
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from spatial_join import read_layer
+
+    parser = argparse.ArgumentParser(description="Render static PNG thumbnails of parcels over a cached basemap")
+    parser.add_argument("input_file", help="Parcels (KML/KMZ, GeoJSON or GeoParquet)")
+    parser.add_argument("output_folder", help="Folder for the PNG files")
+    parser.add_argument("--cache-dir", default="tile_cache")
+    parser.add_argument("--tiles", default=ESRI_WORLD_IMAGERY, help="XYZ tile URL template")
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+
+    args = parser.parse_args()
+    render_thumbnails(read_layer(args.input_file), args.output_folder, cache_dir=args.cache_dir,
+                      url_template=args.tiles, size_px=args.size, batch_size=args.batch_size,
+                      workers=args.workers)
+
+### python static_render.py parcels.kml thumbnails --workers 8
@@ -1,14 +1,12 @@
 import os
 import time
+import numpy as np
 import geopandas as gpd
 
-import pyarrow as pa
-import pyarrow.orc as orc
-
 from glob import glob
-from fastkml import kml
 from shapely.geometry import mapping
-from shapely.geometry import Polygon, MultiPolygon
+
+from geometry_store import GeometryStore
 
 def display_directory_structure(root_dir, indent=""):
     """
@@ -66,6 +64,8 @@ def geojson_to_kml(input_geojson, output_kml):
     attribute exists in the GeoJSON, it is assigned as the name of the corresponding
     KML Placemark; otherwise, the default name is 'Unnamed'.
     """
+    from fastkml import kml
+
     # Load the GeoJSON file into a GeoDataFrame
     gdf = gpd.read_file(input_geojson)
     
@@ -98,14 +98,13 @@ def filter_polygons(gdf, lon_threshold=-82):
     Returns:
     GeoDataFrame: Filtered GeoDataFrame.
     """
-    def filter_by_longitude(geom):
-        """Checks if a geometry meets the longitude threshold."""
-        if isinstance(geom, (Polygon, MultiPolygon)):
-            for polygon in geom.geoms if isinstance(geom, MultiPolygon) else [geom]:
-                for x, y, *_ in polygon.exterior.coords:
-                    if x >= lon_threshold:
-                        return True
-        return False
+    # Any exterior vertex at or east of the threshold keeps the polygon, i.e. its maxx >= threshold.
+    polygonal = gdf.geometry.geom_type.isin(["Polygon", "MultiPolygon"]).to_numpy()
+    keep = np.zeros(len(gdf), dtype=bool)
+    if polygonal.any():
+        store = GeometryStore.from_geoseries(gdf.geometry[polygonal])
+        keep[polygonal] = store.bounds()[:, 2] >= lon_threshold
+    return gdf[keep]
 
 def gdf_to_kml(gdf, output_kml):
     """
@@ -115,6 +114,8 @@ def gdf_to_kml(gdf, output_kml):
     gdf (GeoDataFrame): GeoDataFrame containing geometries.
     output_kml (str): Path to the output KML file where the converted data will be saved.
     """
+    from fastkml import kml
+
     k = kml.KML()
     doc = kml.Document()
     k.append(doc)
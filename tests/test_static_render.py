@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from static_render import TileCache, start_local_tile_server
+
+TILE_BYTES = 1000
+
+
+class TileCacheTest(unittest.TestCase):
+    """Fills a TileCache from the local tile server instead of ESRI/OSM."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.tile_dir = os.path.join(self.tmp_dir, "tiles")
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        for x in range(4):
+            os.makedirs(os.path.join(self.tile_dir, "18", str(x)))
+            with open(os.path.join(self.tile_dir, "18", str(x), "7.png"), "wb") as f:
+                f.write(bytes([x]) * TILE_BYTES)
+        self.server, self.url_template = start_local_tile_server(self.tile_dir)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def get(self, cache, x):
+        # The LRU clock is the file mtime, so make sure consecutive accesses get distinct times.
+        time.sleep(0.02)
+        return cache.get(18, x, 7)
+
+    def test_hits_and_misses(self):
+        cache = TileCache(self.cache_dir, self.url_template, max_bytes=10 * TILE_BYTES)
+        path = self.get(cache, 0)
+        self.get(cache, 0)
+        self.get(cache, 1)
+
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), bytes([0]) * TILE_BYTES)
+
+        # A new cache on the same folder starts warm.
+        cache = TileCache(self.cache_dir, self.url_template, max_bytes=10 * TILE_BYTES)
+        self.get(cache, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        self.assertEqual(cache.total_bytes, 2 * TILE_BYTES)
+
+    def test_lru_eviction_order(self):
+        cache = TileCache(self.cache_dir, self.url_template, max_bytes=int(3.5 * TILE_BYTES))
+        for x in (0, 1, 2):
+            self.get(cache, x)
+        self.get(cache, 0)  # Tile 1 is now the least recently used
+
+        path = self.get(cache, 3)
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(cache.tile_path(18, 1, 7)))
+        for x in (0, 2, 3):
+            self.assertTrue(os.path.exists(cache.tile_path(18, x, 7)))
+        self.assertEqual(cache.total_bytes, 3 * TILE_BYTES)
+
+    def test_new_tile_survives_eviction(self):
+        cache = TileCache(self.cache_dir, self.url_template, max_bytes=TILE_BYTES // 2)
+        for x in range(3):
+            path = self.get(cache, x)
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(cache.misses, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()